@@ -0,0 +1,58 @@
+import logging
+import queue
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.25  # seconds a partial batch waits for more rows
+FLUSH_BATCH_SIZE = 500
+
+
+_queue = queue.SimpleQueue()
+_worker_lock = threading.Lock()
+_worker = None
+
+
+def log_activity(**fields):
+    """
+    Queue an Activity row for insertion off the request path. A daemon
+    thread drains the queue and writes queued rows with one bulk_create,
+    so handlers never wait on the activity INSERT.
+    """
+    _ensure_worker()
+    _queue.put(fields)
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_drain_forever, name='activity-log-writer', daemon=True
+            )
+            _worker.start()
+
+
+def _drain_forever():
+    from .models import Activity
+
+    while True:
+        batch = [_queue.get()]  # block until there is work
+        try:
+            while len(batch) < FLUSH_BATCH_SIZE:
+                batch.append(_queue.get(timeout=FLUSH_INTERVAL))
+        except queue.Empty:
+            pass
+        try:
+            close_old_connections()
+            Activity.objects.bulk_create(
+                [Activity(**fields) for fields in batch],
+                batch_size=FLUSH_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        except Exception:
+            logger.exception(f"Failed to flush {len(batch)} activity rows")
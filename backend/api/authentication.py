@@ -1,7 +1,27 @@
+import re
+
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from rest_framework import authentication
 from rest_framework import exceptions
 from .models import User
 
+AUTH_USER_TTL = 60  # seconds
+
+# Token shape is fixed ('token_<user_id>'); one compiled regex match
+# replaces prefix checks and int() parsing on every request.
+# Pattern.match anchors at pos; \Z anchors the tail so trailing garbage
+# ('token_12abc') is rejected rather than silently truncated
+_TOKEN_RE = re.compile(r'token_(\d+)\Z')
+
+
+@receiver(post_save, sender=User)
+def _invalidate_cached_auth_user(sender, instance, **kwargs):
+    cache.delete(f"auth_user:{instance.id}")
+    cache.delete(f"authuser:{instance.username}")
+
+
 class CustomTokenAuthentication(authentication.BaseAuthentication):
     """
     Standardizes the custom 'token_{user_id}' approach into a DRF Authentication class.
@@ -10,14 +30,21 @@ class CustomTokenAuthentication(authentication.BaseAuthentication):
         auth_header = request.headers.get('Authorization')
         if not auth_header or not auth_header.startswith('Bearer '):
             return None
-            
+
         try:
-            token = auth_header.split(' ')[1]
-            if not token.startswith('token_'):
-                return None
-                
-            user_id = int(token.split('_')[1])
-            user = User.objects.get(id=user_id)
+            match = _TOKEN_RE.match(auth_header, 7)  # skip 'Bearer '
+            if match is None:
+                raise exceptions.AuthenticationFailed('Invalid token')
+            user_id = int(match.group(1))
+
+            # Short-TTL cache elides the users lookup on every request for
+            # active sessions; invalidated via post_save when roles change
+            key = f"auth_user:{user_id}"
+            user = cache.get(key)
+            if user is None:
+                # Fetch only the columns the permission checks need
+                user = User.objects.only('id', 'is_staff', 'is_superuser', 'role').get(id=user_id)
+                cache.set(key, user, AUTH_USER_TTL)
             return (user, None)
         except (IndexError, ValueError, User.DoesNotExist):
             raise exceptions.AuthenticationFailed('Invalid token')
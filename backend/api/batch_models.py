@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Now
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from .models import Product, SaleItem
@@ -21,12 +22,16 @@ class ProductBatch(models.Model):
     quantity = models.IntegerField(validators=[MinValueValidator(1)])
     remaining_quantity = models.IntegerField(validators=[MinValueValidator(0)])
     purchase_date = models.DateTimeField()
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
 
     class Meta:
         db_table = 'product_batches'
         ordering = ['purchase_date']
+        indexes = [
+            models.Index(fields=['product', 'purchase_date'], name='pb_prod_pdate_idx'),
+            models.Index(fields=['product', 'remaining_quantity'], name='pb_prod_rem_idx'),
+        ]
 
     def clean(self):
         if self.remaining_quantity > self.quantity:
@@ -36,15 +41,17 @@ class ProductBatch(models.Model):
         if self.selling_price < 0:
             raise ValidationError('Selling price cannot be negative')
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
+    def save(self, *args, validate=False, **kwargs):
+        # API writes are validated by the serializer; direct saves can opt in.
+        if validate:
+            self.full_clean()
         super().save(*args, **kwargs)
 
 class BatchSaleItem(models.Model):
     sale_item = models.ForeignKey(SaleItem, models.DO_NOTHING)
     batch = models.ForeignKey('ProductBatch', models.DO_NOTHING)
     quantity = models.IntegerField(validators=[MinValueValidator(1)])
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
 
     class Meta:
         db_table = 'batch_sale_items'
@@ -53,8 +60,4 @@ class BatchSaleItem(models.Model):
         # Removed validation to prevent race condition with FIFO sale logic
         # if self.quantity > self.batch.remaining_quantity:
         #     raise ValidationError('Sale quantity cannot exceed batch remaining quantity')
-        pass
-
-    def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs) 
\ No newline at end of file
+        pass
\ No newline at end of file
@@ -1,7 +1,43 @@
+import datetime
+from django.db import models
+from django.utils import timezone
 from rest_framework import serializers
 from .batch_models import ProductBatch, BatchSaleItem
-from .utils import to_nairobi
-from api.serializers import is_price_outlier
+from .utils import to_nairobi, NAIROBI_TZ
+from api.serializers import is_price_outlier, warm_category_price_stats
+
+
+class NairobiDatetimeListSerializer(serializers.ListSerializer):
+    """
+    Converts the child's datetime fields to Nairobi time in one pass over the
+    page, instead of a to_nairobi call (and tz lookup) per field per row.
+    """
+    datetime_fields = ()
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        base_repr = serializers.ModelSerializer.to_representation
+        child = self.child
+        out = []
+        for item in iterable:
+            rep = base_repr(child, item)
+            for field in self.datetime_fields:
+                value = getattr(item, field, None)
+                if value is not None:
+                    if timezone.is_naive(value):
+                        value = timezone.make_aware(value, datetime.timezone.utc)
+                    rep[field] = value.astimezone(NAIROBI_TZ).isoformat()
+            out.append(rep)
+        return out
+
+
+class ProductBatchListSerializer(NairobiDatetimeListSerializer):
+    datetime_fields = ('purchase_date', 'created_at', 'updated_at')
+
+
+class BatchSaleItemListSerializer(NairobiDatetimeListSerializer):
+    datetime_fields = ('created_at',)
+
 
 class ProductBatchSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,12 +48,49 @@ class ProductBatchSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        list_serializer_class = ProductBatchListSerializer
+
+    @classmethod
+    def bulk_check_outliers(cls, validated_list, force=False):
+        """
+        Outlier-check a whole import in two passes: one grouped query warms
+        the per-category price stats cache, then every item is compared
+        against its cached bounds. Raises ValidationError listing offenders.
+        """
+        if force:
+            return
+        warm_category_price_stats(
+            getattr(item.get('product'), 'category_id', None) for item in validated_list
+        )
+        errors = []
+        for idx, item in enumerate(validated_list):
+            product = item.get('product')
+            selling_price = float(item.get('selling_price', 0) or 0)
+            if product and selling_price > 0 and product.name and product.category_id:
+                is_outlier, stats = is_price_outlier(product.name, product.category_id, selling_price)
+                if is_outlier:
+                    errors.append(
+                        f"Item {idx}: selling price ({selling_price}) is an outlier for similar "
+                        f"products in this category. Typical range: "
+                        f"{stats['lower_bound']:.2f} - {stats['upper_bound']:.2f}."
+                    )
+        if errors:
+            raise serializers.ValidationError({'selling_price': errors})
+
+    def validate(self, attrs):
+        # Cross-field check previously enforced by ProductBatch.full_clean on save
+        quantity = attrs.get('quantity', getattr(self.instance, 'quantity', None))
+        remaining = attrs.get('remaining_quantity', getattr(self.instance, 'remaining_quantity', None))
+        if quantity is not None and remaining is not None and remaining > quantity:
+            raise serializers.ValidationError('Remaining quantity cannot be greater than initial quantity')
+        return attrs
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        for field in ['purchase_date', 'created_at', 'updated_at']:
-            if data.get(field):
-                data[field] = to_nairobi(getattr(instance, field)).isoformat() if getattr(instance, field) else None
+        for field in ('purchase_date', 'created_at', 'updated_at'):
+            value = getattr(instance, field, None)
+            if value is not None:
+                data[field] = to_nairobi(value).isoformat()
         return data
 
     def create(self, validated_data):
@@ -61,9 +134,12 @@ class BatchSaleItemSerializer(serializers.ModelSerializer):
         model = BatchSaleItem
         fields = ['id', 'sale_item', 'batch', 'quantity', 'created_at']
         read_only_fields = ['id', 'created_at']
+        list_serializer_class = BatchSaleItemListSerializer
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        if data.get('created_at'):
-            data['created_at'] = to_nairobi(getattr(instance, 'created_at')).isoformat() if getattr(instance, 'created_at') else None
-        return data 
+        value = getattr(instance, 'created_at', None)
+        if value is not None:
+            data['created_at'] = to_nairobi(value).isoformat()
+        return data
+
@@ -1,153 +1,137 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Q, Count, Sum, Avg, F
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import timedelta
 from .batch_models import ProductBatch, BatchSaleItem
 from .batch_serializers import ProductBatchSerializer, BatchSaleItemSerializer
-from .models import Product, SaleItem, Activity
+from .models import Product, SaleItem
+from .activity_log import log_activity
+from .authentication import CustomTokenAuthentication
+from .permissions import IsBatchAuthorized
 from django.db import connection
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 import logging
 
 logger = logging.getLogger(__name__)
 
+BATCH_STATS_TTL = 60  # seconds; dashboards poll stats far more often than batches change
+
+# Columns the batch list actually serializes, plus the product columns the
+# outlier checks read; keeps the projection off the wide products row
+BATCH_LIST_FIELDS = tuple(ProductBatchSerializer.Meta.fields) + (
+    'product__name', 'product__category_id',
+)
+
+
+@receiver(post_save, sender=ProductBatch)
+@receiver(post_delete, sender=ProductBatch)
+def _invalidate_batch_stats(sender, instance, **kwargs):
+    cache.delete(f"batch_stats:{instance.product_id}")
+
 class ProductBatchViewSet(viewsets.ModelViewSet):
     queryset = ProductBatch.objects.all()
     serializer_class = ProductBatchSerializer
-    permission_classes = []
+    authentication_classes = [CustomTokenAuthentication]
+    permission_classes = [IsBatchAuthorized]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['batch_number']
     ordering_fields = ['purchase_date', 'remaining_quantity', 'purchase_price']
 
-    def check_token_auth(self, request):
-        try:
-            auth_header = request.headers.get('Authorization')
-            if not auth_header or not auth_header.startswith('Bearer '):
-                logger.warning('Missing or invalid authorization header')
-                return False, None, False
-
-            token = auth_header.split(' ')[1]
-            if not token:
-                logger.warning('Invalid token format')
-                return False, None, False
-
-            try:
-                parts = token.split('_')
-                user_id = int(parts[1]) if len(parts) > 1 else None
-
-                with connection.cursor() as cursor:
-                    cursor.execute(
-                        "SELECT is_staff, is_superuser, role FROM users WHERE id = %s",
-                        [user_id]
-                    )
-                    row = cursor.fetchone()
-                    if row:
-                        is_staff, is_superuser, role = row
-                        # Allow access if user is staff, superuser, admin, or manager
-                        is_authorized = is_staff or is_superuser or (role and role.lower() in ['admin', 'manager', 'staff'])
-                        return True, user_id, is_authorized
-                return False, None, False
-            except (IndexError, ValueError) as e:
-                logger.warning(f'Error parsing token: {str(e)}')
-                return False, None, False
-        except Exception as e:
-            logger.error(f'Unexpected error in token authentication: {str(e)}')
-            return False, None, False
-
     def get_queryset(self):
-        is_authenticated, user_id, is_authorized = self.check_token_auth(self.request)
-        if not is_authenticated or not is_authorized:
-            return ProductBatch.objects.none()
-
-        queryset = super().get_queryset()
-        product_id = self.request.query_params.get('product_id')
-        min_remaining = self.request.query_params.get('min_remaining')
-        max_remaining = self.request.query_params.get('max_remaining')
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-
-        if product_id:
-            queryset = queryset.filter(product_id=product_id)
-        if min_remaining:
-            queryset = queryset.filter(remaining_quantity__gte=min_remaining)
-        if max_remaining:
-            queryset = queryset.filter(remaining_quantity__lte=max_remaining)
-        if start_date:
-            queryset = queryset.filter(purchase_date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(purchase_date__lte=end_date)
+        # Join the product row up front so serialization never lazy-loads it
+        # per batch; only() keeps the projection to the columns actually read
+        # and the explicit ordering stabilizes pagination on the FIFO index
+        queryset = (
+            ProductBatch.objects.select_related('product')
+            .only(*BATCH_LIST_FIELDS)
+            .order_by('purchase_date', 'id')
+        )
+
+        # Collect the filters and apply them in one call instead of
+        # rebuilding the query once per parameter
+        params = self.request.query_params
+        lookups = {}
+        if params.get('product_id'):
+            lookups['product_id'] = params['product_id']
+        if params.get('min_remaining'):
+            lookups['remaining_quantity__gte'] = params['min_remaining']
+        if params.get('max_remaining'):
+            lookups['remaining_quantity__lte'] = params['max_remaining']
+        if params.get('start_date'):
+            lookups['purchase_date__gte'] = params['start_date']
+        if params.get('end_date'):
+            lookups['purchase_date__lte'] = params['end_date']
+        if lookups:
+            queryset = queryset.filter(**lookups)
 
         return queryset
 
-    def list(self, request, *args, **kwargs):
-        is_authenticated, user_id, is_authorized = self.check_token_auth(request)
-        if not is_authenticated:
-            return Response({"detail": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
-        if not is_authorized:
-            return Response({"detail": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-        return super().list(request, *args, **kwargs)
+    def get_serializer_context(self):
+        # The serializers gate their outlier checks on context['force'],
+        # which nothing ever set; accept the flag from either the query
+        # string (?force=1) or the request body (the frontend sends it
+        # there when resubmitting past the outlier warning)
+        context = super().get_serializer_context()
+        request = self.request
+        data = request.data if isinstance(request.data, dict) else {}
+        context['force'] = (
+            request.query_params.get('force') in ('true', '1')
+            or bool(data.get('force'))
+        )
+        return context
 
     @transaction.atomic
     def create(self, request, *args, **kwargs):
-        is_authenticated, user_id, is_authorized = self.check_token_auth(request)
-        if not is_authenticated:
-            return Response({"detail": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
-        if not is_authorized:
-            return Response({"detail": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-
         try:
-            product_id = request.data.get('product')
-            quantity = int(request.data.get('quantity', 0))
-            purchase_price = float(request.data.get('purchase_price', 0))
-            selling_price = request.data.get('selling_price')
-
-            if not selling_price:
+            if not request.data.get('selling_price'):
                 return Response(
                     {"detail": "Selling price is required for batches"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Get the product
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT id, quantity, sell_price FROM products WHERE id = %s", [product_id])
-                product = cursor.fetchone()
-                if not product:
-                    return Response(
-                        {"detail": "Product not found"},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-
-            # Set remaining_quantity equal to quantity
-            request.data['remaining_quantity'] = quantity
+            # Set remaining_quantity equal to quantity; both are parsed once
+            # by the serializer below instead of pre-parsing request.data here
+            request.data['remaining_quantity'] = request.data.get('quantity', 0)
 
-            # Create the batch
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
-            self.perform_create(serializer)
+            quantity = serializer.validated_data['quantity']
+            product_id = serializer.validated_data['product'].pk
 
-            # Update product quantity
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "UPDATE products SET quantity = quantity + %s WHERE id = %s",
-                    [quantity, product_id]
+            # Bump the product quantity; the update count doubles as the
+            # existence check so one statement replaces the old SELECT + UPDATE
+            updated = Product.objects.filter(pk=product_id).update(quantity=F('quantity') + quantity)
+            if not updated:
+                return Response(
+                    {"detail": "Product not found"},
+                    status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Create activity log
-            Activity.objects.create(
+            # Create the batch
+            self.perform_create(serializer)
+
+            # Queue the activity after commit; a worker thread batches the INSERTs
+            user_id = request.user.id
+            transaction.on_commit(lambda: log_activity(
                 type='batch_added',
                 description=f'New batch added for product {product_id}',
                 product_id=product_id,
                 user_id=user_id,
                 created_at=timezone.now(),
                 status='completed'
-            )
+            ))
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         except Exception as e:
-            logger.error(f"Error creating batch: {str(e)}")
+            logger.error("Error creating batch: %s", e)
             return Response(
                 {"detail": f"Error creating batch: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -156,68 +140,60 @@ class ProductBatchViewSet(viewsets.ModelViewSet):
     @transaction.atomic
     def update(self, request, *args, **kwargs):
         try:
-            is_authenticated, user_id, is_authorized = self.check_token_auth(request)
             instance = self.get_object()
             old_quantity = instance.quantity
             old_remaining = instance.remaining_quantity
-            new_quantity = int(request.data.get('quantity', old_quantity))
-
-            # Log the request data for debugging
-            logger.info(f"Update batch request data: {request.data}")
-
-            # Ensure selling_price is properly handled
-            if 'selling_price' in request.data:
-                if request.data['selling_price'] == '' or request.data['selling_price'] is None:
-                    request.data['selling_price'] = None
-                else:
-                    try:
-                        request.data['selling_price'] = float(request.data['selling_price'])
-                    except (ValueError, TypeError):
-                        return Response(
-                            {"detail": "Invalid selling price format"},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
 
-            # If quantity is being updated, update remaining_quantity accordingly
-            if 'quantity' in request.data:
-                sold = old_quantity - old_remaining
-                new_remaining = max(new_quantity - sold, 0)
-                request.data['remaining_quantity'] = new_remaining
+            # Lazy %s formatting skips rendering when the level is disabled;
+            # the full body only gets stringified at DEBUG
+            logger.info("Update batch %s by user %s", instance.id, request.user.id)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Update batch request data: %s", request.data)
+
+            # Normalize empty selling_price; the serializer parses the value itself
+            if 'selling_price' in request.data and request.data['selling_price'] == '':
+                request.data['selling_price'] = None
 
             serializer = self.get_serializer(instance, data=request.data, partial=True)
             if not serializer.is_valid():
-                logger.error(f"Serializer validation errors: {serializer.errors}")
+                logger.error("Serializer validation errors: %s", serializer.errors)
                 return Response(
                     {"detail": "Invalid data", "errors": serializer.errors},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            self.perform_update(serializer)
+            new_quantity = serializer.validated_data.get('quantity', old_quantity)
+
+            # If quantity is being updated, adjust remaining_quantity accordingly
+            save_kwargs = {}
+            if 'quantity' in serializer.validated_data:
+                sold = old_quantity - old_remaining
+                save_kwargs['remaining_quantity'] = max(new_quantity - sold, 0)
+
+            serializer.save(**save_kwargs)
 
             # Update product quantity if quantity changed
             if old_quantity != new_quantity:
                 quantity_diff = new_quantity - old_quantity
-                with connection.cursor() as cursor:
-                    cursor.execute(
-                        "UPDATE products SET quantity = quantity + %s WHERE id = %s",
-                        [quantity_diff, instance.product_id]
-                    )
+                Product.objects.filter(pk=instance.product_id).update(quantity=F('quantity') + quantity_diff)
 
-            # Create activity log for the update
-            Activity.objects.create(
+            # Queue the activity after commit; a worker thread batches the INSERTs
+            user_id = request.user.id
+            batch_id, batch_product_id = instance.id, instance.product_id
+            transaction.on_commit(lambda: log_activity(
                 type='batch_updated',
-                description=f'Batch #{instance.id} updated for product {instance.product_id}',
-                product_id=instance.product_id,
+                description=f'Batch #{batch_id} updated for product {batch_product_id}',
+                product_id=batch_product_id,
                 user_id=user_id,
                 created_at=timezone.now(),
                 status='completed'
-            )
+            ))
 
             return Response({"detail": "Batch updated successfully", "data": serializer.data})
 
         except Exception as e:
             error_msg = str(e)
-            logger.error(f"Error updating batch: {error_msg}")
+            logger.error("Error updating batch: %s", error_msg)
             return Response(
                 {"detail": "Error updating batch. Please try again."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -228,46 +204,88 @@ class ProductBatchViewSet(viewsets.ModelViewSet):
         try:
             instance = self.get_object()
 
-            # Check if batch has any sales
+            # One CTE checks for sales, deletes the batch and adjusts the
+            # product quantity atomically, replacing three round-trips
             with connection.cursor() as cursor:
-                cursor.execute(
-                    "SELECT COUNT(*) FROM batch_sale_items WHERE batch_id = %s",
-                    [instance.id]
-                )
-                sale_count = cursor.fetchone()[0]
-
-                if sale_count > 0:
+                cursor.execute("""
+                    WITH sold AS (
+                        SELECT COUNT(*) AS c FROM batch_sale_items WHERE batch_id = %s
+                    ), deleted AS (
+                        DELETE FROM product_batches
+                        WHERE id = %s AND (SELECT c FROM sold) = 0
+                        RETURNING product_id, quantity
+                    )
+                    UPDATE products p
+                    SET quantity = p.quantity - d.quantity
+                    FROM deleted d
+                    WHERE p.id = d.product_id
+                    RETURNING p.id
+                """, [instance.id, instance.id])
+                if cursor.fetchone() is None:
                     return Response(
                         {"detail": "Cannot delete batch with existing sales"},
                         status=status.HTTP_400_BAD_REQUEST
                     )
 
-            # Update product quantity
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "UPDATE products SET quantity = quantity - %s WHERE id = %s",
-                    [instance.quantity, instance.product_id]
-                )
-
-            self.perform_destroy(instance)
+            # The raw DELETE bypasses the post_delete receiver, so drop the
+            # cached stats for this product explicitly
+            cache.delete(f"batch_stats:{instance.product_id}")
             return Response({"detail": "Batch deleted successfully"}, status=status.HTTP_200_OK)
 
         except Exception as e:
             error_msg = str(e)
-            logger.error(f"Error deleting batch: {error_msg}")
+            logger.error("Error deleting batch: %s", error_msg)
             return Response(
                 {"detail": "Error deleting batch. Please try again."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['post'])
+    @transaction.atomic
+    def bulk_create(self, request):
+        try:
+            items = request.data if isinstance(request.data, list) else request.data.get('items')
+            if not items:
+                return Response(
+                    {"detail": "A non-empty list of batches is required"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            for item in items:
+                item.setdefault('remaining_quantity', item.get('quantity', 0))
+
+            serializer = self.get_serializer(data=items, many=True)
+            serializer.is_valid(raise_exception=True)
+
+            # One grouped query pre-computes outlier bounds for all distinct
+            # categories, instead of one aggregation per imported batch;
+            # force comes from the same place the serializer context reads
+            force = self.get_serializer_context()['force']
+            ProductBatchSerializer.bulk_check_outliers(serializer.validated_data, force=force)
+
+            self.perform_create(serializer)
+
+            # Aggregate quantity bumps per product
+            deltas = {}
+            for item in serializer.validated_data:
+                product_id = item['product'].pk
+                deltas[product_id] = deltas.get(product_id, 0) + item['quantity']
+            for product_id, delta in deltas.items():
+                Product.objects.filter(pk=product_id).update(quantity=F('quantity') + delta)
+
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        except ValidationError:
+            raise
+        except Exception as e:
+            logger.error("Error bulk creating batches: %s", e)
+            return Response(
+                {"detail": f"Error bulk creating batches: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        is_authenticated, user_id, is_authorized = self.check_token_auth(request)
-        if not is_authenticated:
-            return Response({"detail": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
-        if not is_authorized:
-            return Response({"detail": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-
         product_id = request.query_params.get('product_id')
         if not product_id:
             return Response(
@@ -276,121 +294,50 @@ class ProductBatchViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT 
-                        COUNT(*) as total_batches,
-                        COALESCE(SUM(quantity), 0) as total_quantity,
-                        COALESCE(SUM(remaining_quantity), 0) as total_remaining,
-                        COALESCE(AVG(purchase_price), 0) as avg_price
-                    FROM product_batches
-                    WHERE product_id = %s
-                """, [product_id])
-                stats = cursor.fetchone()
+            key = f"batch_stats:{product_id}"
+            payload = cache.get(key)
+            if payload is not None:
+                return Response(payload)
+
+            stats = ProductBatch.objects.filter(product_id=product_id).aggregate(
+                total_batches=Count('id'),
+                total_quantity=Coalesce(Sum('quantity'), 0),
+                total_remaining=Coalesce(Sum('remaining_quantity'), 0),
+                avg_price=Avg('purchase_price'),
+            )
 
-            return Response({
-                'total_batches': stats[0] or 0,
-                'total_quantity': stats[1] or 0,
-                'total_remaining': stats[2] or 0,
-                'average_price': float(stats[3] or 0)
-            })
+            payload = {
+                'total_batches': stats['total_batches'],
+                'total_quantity': stats['total_quantity'],
+                'total_remaining': stats['total_remaining'],
+                'average_price': float(stats['avg_price'] or 0)
+            }
+            cache.set(key, payload, BATCH_STATS_TTL)
+            return Response(payload)
 
         except Exception as e:
-            logger.error(f"Error getting batch stats: {str(e)}")
+            logger.error("Error getting batch stats: %s", e)
             return Response(
                 {"detail": f"Error getting batch statistics: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
 class BatchSaleItemViewSet(viewsets.ModelViewSet):
-    queryset = BatchSaleItem.objects.all()
+    queryset = BatchSaleItem.objects.select_related('sale_item__sale', 'batch__product')
     serializer_class = BatchSaleItemSerializer
-
-    def check_token_auth(self, request):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return False, None, False
-
-        token = auth_header.split(' ')[1]
-        if not token:
-            return False, None, False
-
-        try:
-            # Extract user_id from token, handling different formats
-            user_id = None
-            if token.startswith('token_'):
-                parts = token.split('_')
-                if len(parts) > 1:
-                    user_id = int(parts[1])
-            else:
-                # Try to extract user_id from other token formats
-                parts = token.split('_')
-                if len(parts) > 0:
-                    # Try to find a part that can be converted to an integer
-                    for part in parts:
-                        try:
-                            user_id = int(part)
-                            break
-                        except ValueError:
-                            continue
-
-            if user_id is None:
-                return False, None, False
-
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "SELECT is_staff, is_superuser, role FROM users WHERE id = %s",
-                    [user_id]
-                )
-                row = cursor.fetchone()
-                if row:
-                    is_staff, is_superuser, role = row
-                    # Allow access if user is staff, superuser, admin, or manager
-                    is_authorized = is_staff or is_superuser or (role and role.lower() in ['admin', 'manager', 'staff'])
-                    return True, user_id, is_authorized
-            return False, None, False
-        except (IndexError, ValueError) as e:
-            logger.warning(f'Error parsing token: {str(e)}')
-            return False, None, False
-        except Exception as e:
-            logger.error(f'Unexpected error in token authentication: {str(e)}')
-            return False, None, False
+    authentication_classes = [CustomTokenAuthentication]
+    permission_classes = [IsBatchAuthorized]
 
     def get_queryset(self):
-        is_authenticated, user_id, is_authorized = self.check_token_auth(self.request)
-        if not is_authenticated:
-            return BatchSaleItem.objects.none()
-        if not is_authorized:
-            return BatchSaleItem.objects.none()
-
-        queryset = super().get_queryset()
+        # select_related avoids one query per row when serialization touches the FKs
+        queryset = BatchSaleItem.objects.select_related('sale_item__sale', 'batch__product')
         sale_id = self.request.query_params.get('sale_id')
         if sale_id:
             return queryset.filter(sale_item__sale_id=sale_id)
         return queryset
 
-    def list(self, request, *args, **kwargs):
-        is_authenticated, user_id, is_authorized = self.check_token_auth(request)
-        if not is_authenticated:
-            return Response({"detail": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
-        if not is_authorized:
-            return Response({"detail": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-        return super().list(request, *args, **kwargs)
-
     @transaction.atomic
     def create(self, request, *args, **kwargs):
-        is_authenticated, user_id, is_authorized = self.check_token_auth(request)
-        if not is_authenticated:
-            return Response(
-                {"detail": "Authentication required"},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
-        if not is_authorized:
-            return Response(
-                {"detail": "Permission denied"},
-                status=status.HTTP_403_FORBIDDEN
-            )
-
         try:
             sale_item_id = request.data.get('sale_item')
             quantity = int(request.data.get('quantity', 0))
@@ -424,37 +371,67 @@ class BatchSaleItemViewSet(viewsets.ModelViewSet):
                 current_buy_price = product[1]
                 current_sell_price = product[2]
 
-                # Get all batches ordered by purchase_date
-                cursor.execute("""
-                    SELECT id, remaining_quantity, selling_price, purchase_price, purchase_date
-                    FROM product_batches
-                    WHERE product_id = %s AND remaining_quantity > 0
-                    ORDER BY purchase_date ASC, id ASC
-                """, [product_id])
-                batches = cursor.fetchall()
-                batch_idx = 0
-
-                # FIFO loop: use batches only
-                while quantity > 0:
-                    if batch_idx < len(batches):
-                        batch = batches[batch_idx]
-                        batch_id = batch[0]
-                        batch_remaining = batch[1]
-                        batch_selling_price = batch[2]
-                        batch_purchase_price = batch[3]
+                # Fast path: if the oldest open batch can cover the whole sale,
+                # decrement it and record the sale portion in one atomic
+                # statement (the UPDATE's row lock closes the TOCTOU window
+                # between picking a batch and decrementing it).
+                if quantity > 0:
+                    cursor.execute("""
+                        WITH oldest AS (
+                            SELECT id FROM product_batches
+                            WHERE product_id = %s AND remaining_quantity > 0
+                            ORDER BY purchase_date ASC, id ASC
+                            LIMIT 1
+                            FOR UPDATE SKIP LOCKED
+                        ), picked AS (
+                            UPDATE product_batches pb
+                            SET remaining_quantity = pb.remaining_quantity - %s
+                            FROM oldest
+                            WHERE pb.id = oldest.id AND pb.remaining_quantity >= %s
+                            RETURNING pb.id, pb.purchase_price, pb.selling_price
+                        ), inserted AS (
+                            INSERT INTO batch_sale_items (sale_item_id, batch_id, quantity, created_at)
+                            SELECT %s, id, %s, now() FROM picked
+                            RETURNING id
+                        )
+                        SELECT picked.id, picked.purchase_price, picked.selling_price FROM picked
+                    """, [product_id, quantity, quantity, sale_item_id, quantity])
+                    picked = cursor.fetchone()
+                    if picked:
+                        Product.objects.filter(pk=product_id).update(quantity=F('quantity') - quantity)
+                        sale_portions.append({
+                            'type': 'batch',
+                            'batch_id': picked[0],
+                            'quantity': quantity,
+                            'buy_price': picked[1],
+                            'sell_price': picked[2]
+                        })
+                        return Response(
+                            {'detail': f'Sale of {original_quantity} completed FIFO', 'portions': sale_portions},
+                            status=status.HTTP_201_CREATED
+                        )
+
+                # Stream batches oldest-first: the server-side cursor pulls
+                # small chunks, so a sale covered by the first batch or two
+                # never materializes the whole batch history
+                batch_updates = []  # (use_qty, batch_id) rows for one bulk UPDATE
+                with connection.chunked_cursor() as fifo_cursor:
+                    fifo_cursor.cursor.itersize = 16
+                    # SKIP LOCKED lets concurrent sales of the same product
+                    # claim disjoint batches instead of queueing or racing
+                    # the later bulk decrement
+                    fifo_cursor.execute("""
+                        SELECT id, remaining_quantity, selling_price, purchase_price
+                        FROM product_batches
+                        WHERE product_id = %s AND remaining_quantity > 0
+                        ORDER BY purchase_date ASC, id ASC
+                        FOR UPDATE SKIP LOCKED
+                    """, [product_id])
+                    for batch_id, batch_remaining, batch_selling_price, batch_purchase_price in fifo_cursor:
+                        if quantity <= 0:
+                            break
                         use_qty = min(quantity, batch_remaining)
-                        # Update batch remaining_quantity
-                        cursor.execute("""
-                            UPDATE product_batches
-                            SET remaining_quantity = remaining_quantity - %s
-                            WHERE id = %s
-                        """, [use_qty, batch_id])
-                        # Update product quantity
-                        cursor.execute("""
-                            UPDATE products
-                            SET quantity = quantity - %s
-                            WHERE id = %s
-                        """, [use_qty, product_id])
+                        batch_updates.append((use_qty, batch_id))
                         # Record this portion
                         sale_portions.append({
                             'type': 'batch',
@@ -463,55 +440,51 @@ class BatchSaleItemViewSet(viewsets.ModelViewSet):
                             'buy_price': batch_purchase_price,
                             'sell_price': batch_selling_price
                         })
-                        batches = list(batches)
-                        batches[batch_idx] = (batch_id, batch_remaining - use_qty, batch_selling_price, batch_purchase_price, batch[4])
-                        quantity -= use_qty
-                        # If batch is depleted, move to next batch
-                        if batches[batch_idx][1] == 0:
-                            batch_idx += 1
-                        continue
-                    # If no more batches, use regular product quantity
-                    if product_quantity > 0:
-                        use_qty = min(quantity, product_quantity)
-                        cursor.execute("""
-                            UPDATE products
-                            SET quantity = quantity - %s
-                            WHERE id = %s
-                        """, [use_qty, product_id])
-                        sale_portions.append({
-                            'type': 'regular',
-                            'quantity': use_qty,
-                            'buy_price': current_buy_price,
-                            'sell_price': current_sell_price
-                        })
-                        product_quantity -= use_qty
                         quantity -= use_qty
-                        continue
-                    # If no stock left
-                    break
-
-                # Now, create sale items for each portion
-                for portion in sale_portions:
-                    if portion['type'] == 'regular':
-                        serializer = self.get_serializer(data={
-                            'sale_item': sale_item_id,
-                            'quantity': portion['quantity']
-                        })
-                        serializer.is_valid(raise_exception=True)
-                        self.perform_create(serializer)
-                    elif portion['type'] == 'batch':
-                        serializer = self.get_serializer(data={
-                            'sale_item': sale_item_id,
-                            'batch': portion['batch_id'],
-                            'quantity': portion['quantity']
-                        })
-                        serializer.is_valid(raise_exception=True)
-                        self.perform_create(serializer)
+
+                # If batches were not enough, use regular product quantity
+                if quantity > 0 and product_quantity > 0:
+                    use_qty = min(quantity, product_quantity)
+                    sale_portions.append({
+                        'type': 'regular',
+                        'quantity': use_qty,
+                        'buy_price': current_buy_price,
+                        'sell_price': current_sell_price
+                    })
+                    product_quantity -= use_qty
+                    quantity -= use_qty
+
+                # Decrement all consumed batches in one statement
+                if batch_updates:
+                    values_sql = ", ".join(["(%s, %s)"] * len(batch_updates))
+                    params = [value for pair in batch_updates for value in pair]
+                    cursor.execute(f"""
+                        UPDATE product_batches AS pb
+                        SET remaining_quantity = pb.remaining_quantity - v.qty
+                        FROM (VALUES {values_sql}) AS v(qty, id)
+                        WHERE pb.id = v.id
+                    """, params)
+
+                # One aggregated product decrement instead of one per portion
+                total_consumed = original_quantity - quantity
+                if total_consumed:
+                    Product.objects.filter(pk=product_id).update(quantity=F('quantity') - total_consumed)
+
+                # Single bulk insert replaces the per-portion serializer saves;
+                # the portions were computed server-side from validated rows
+                BatchSaleItem.objects.bulk_create([
+                    BatchSaleItem(
+                        sale_item_id=sale_item_id,
+                        batch_id=portion.get('batch_id'),
+                        quantity=portion['quantity']
+                    )
+                    for portion in sale_portions
+                ], batch_size=500)
 
             return Response({'detail': f'Sale of {original_quantity} completed FIFO', 'portions': sale_portions}, status=status.HTTP_201_CREATED)
 
         except Exception as e:
-            logger.error(f"Error creating batch sale item: {str(e)}")
+            logger.error("Error creating batch sale item: %s", e)
             return Response(
                 {"detail": f"Error creating batch sale item: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -527,14 +500,17 @@ class BatchSaleItemViewSet(viewsets.ModelViewSet):
             )
 
         try:
+            # Let Postgres build the JSON so Python does not allocate a dict
+            # (and a float cast) per row
             with connection.cursor() as cursor:
                 cursor.execute("""
-                    SELECT 
-                        bsi.id,
-                        bsi.quantity,
-                        pb.batch_number,
-                        pb.purchase_price,
-                        p.name as product_name
+                    SELECT COALESCE(json_agg(json_build_object(
+                        'id', bsi.id,
+                        'quantity', bsi.quantity,
+                        'batch_number', pb.batch_number,
+                        'purchase_price', pb.purchase_price::float,
+                        'product_name', p.name
+                    )), '[]'::json)
                     FROM batch_sale_items bsi
                     JOIN product_batches pb ON bsi.batch_id = pb.id
                     JOIN products p ON pb.product_id = p.id
@@ -542,19 +518,13 @@ class BatchSaleItemViewSet(viewsets.ModelViewSet):
                         SELECT id FROM sale_items WHERE sale_id = %s
                     )
                 """, [sale_id])
-                details = cursor.fetchall()
+                details = cursor.fetchone()[0]
 
-            return Response([{
-                'id': row[0],
-                'quantity': row[1],
-                'batch_number': row[2],
-                'purchase_price': float(row[3]),
-                'product_name': row[4]
-            } for row in details])
+            return Response(details)
 
         except Exception as e:
-            logger.error(f"Error getting sale details: {str(e)}")
+            logger.error("Error getting sale details: %s", e)
             return Response(
                 {"detail": "Error getting sale details"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            ) 
+            )
@@ -14,5 +14,10 @@ class SyncProgressConsumer(AsyncJsonWebsocketConsumer):
         logger.info(f"SyncProgressConsumer disconnected with code {close_code}")
     
     async def sync_update(self, event):
-        """Receive message from group and send to WebSocket."""
-        await self.send_json(event['data'])
+        """Relay a pre-serialized group message to the WebSocket.
+
+        The producer encodes the payload once before group_send, so the
+        per-subscriber hop is a plain frame write with no json.dumps on
+        the event loop.
+        """
+        await self.send(text_data=event['text'])
@@ -0,0 +1,106 @@
+"""Model-fitting helpers for demand forecasting.
+
+Deliberately free of Django imports: joblib's loky workers re-import the
+module that defines the function they run, and importing Django models
+in a fresh process without django.setup() raises AppRegistryNotReady.
+Keeping the fitting code here means workers only pay for pandas/Prophet.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+from scipy.stats import poisson
+
+SMALL_SERIES_POINTS = 14  # below this, a mean forecast beats a Stan fit
+
+# Built once; every fit passes the same base configuration
+BASE_MODEL_KWARGS = dict(
+    yearly_seasonality=False,  # Disabled for small datasets
+    weekly_seasonality=True,
+    daily_seasonality=False,
+    changepoint_prior_scale=0.1,  # More flexible trend changes
+    seasonality_prior_scale=5.0,  # Reduced seasonality strength
+    holidays_prior_scale=5.0,     # Reduced holiday effects
+    # Posterior-predictive simulation dominates predict(); 200 draws keeps
+    # the CI rows save_forecasts stores while cutting simulation ~5x from
+    # the default 1000
+    uncertainty_samples=200,
+)
+
+
+def fit_forecast(df_records: Dict, forecast_days: int) -> Dict:
+    """Fit Prophet for one product's sales frame.
+
+    Top-level so worker processes can pickle it by reference; the Stan fit
+    is single-threaded and CPU-bound, which makes products embarrassingly
+    parallel.
+    """
+    df = pd.DataFrame(df_records)
+
+    # Sparse series: the Stan fit costs seconds and has nothing to learn at
+    # this density, so project the recent mean with a Poisson interval
+    if len(df) < SMALL_SERIES_POINTS:
+        mu = float(df['y'].tail(7).mean())
+        lower, upper = poisson.interval(0.8, mu) if mu > 0 else (0.0, 0.0)
+        last_ds = pd.to_datetime(df['ds'].iloc[-1])
+        forecast = pd.DataFrame({
+            'ds': pd.date_range(last_ds + pd.Timedelta(days=1), periods=forecast_days),
+            'yhat': np.full(forecast_days, mu),
+            'yhat_lower': np.full(forecast_days, lower),
+            'yhat_upper': np.full(forecast_days, upper),
+            'trend': np.full(forecast_days, mu),
+        })
+        return {
+            'forecast': forecast,
+            'metrics': {'trend': mu, 'seasonality': 0, 'uncertainty': upper - lower},
+            'model_name': 'MovingAverage',
+        }
+
+    # Configure Prophet model with more flexible parameters for small datasets
+    model = Prophet(**BASE_MODEL_KWARGS)
+
+    # Add custom seasonality only if we have enough data
+    if len(df) >= 7:
+        model.add_seasonality(
+            name='monthly',
+            period=30.5,
+            fourier_order=3  # Reduced from 5 to 3 for smaller datasets
+        )
+
+    # Fit model
+    model.fit(df)
+
+    # Generate forecast over the future days only; make_future_dataframe
+    # would include all history and predict() would re-evaluate it just to
+    # be thrown away by the tail() below
+    last = df['ds'].max()
+    future = pd.DataFrame({
+        'ds': pd.date_range(last + pd.Timedelta(days=1), periods=forecast_days)
+    })
+    forecast = model.predict(future)
+
+    # Get forecast metrics
+    metrics = {
+        'trend': forecast['trend'].iloc[-1],
+        'seasonality': forecast['yearly'].iloc[-1] if 'yearly' in forecast else 0,
+        'uncertainty': forecast['yhat_upper'].iloc[-1] - forecast['yhat_lower'].iloc[-1]
+    }
+
+    return {
+        'forecast': forecast.tail(forecast_days),
+        'metrics': metrics,
+        'model_name': 'Prophet',
+    }
+
+
+def fit_one(product_id: int, df_records: Dict, forecast_days: int):
+    """Worker wrapper returning (product_id, forecast, error).
+
+    Catches per-product failures in the worker so one bad series doesn't
+    abort the whole Parallel batch.
+    """
+    try:
+        return product_id, fit_forecast(df_records, forecast_days), None
+    except Exception as e:
+        return product_id, None, str(e)
@@ -22,31 +22,23 @@ class Command(BaseCommand):
         cleanup = options['cleanup']
         product_id = options['product_id']
 
-        # Build the base query
+        # Build the base query; EXISTS stops at the first matching sale item
+        # instead of counting them all per product
         with connection.cursor() as cursor:
             if product_id:
                 # Check specific product
                 cursor.execute("""
-                    SELECT 
-                        p.id,
-                        p.name,
-                        COUNT(si.id) as sale_items_count
+                    SELECT p.id, p.name
                     FROM products p
-                    LEFT JOIN sale_items si ON p.id = si.product_id
                     WHERE p.id = %s
-                    GROUP BY p.id, p.name
+                      AND EXISTS (SELECT 1 FROM sale_items si WHERE si.product_id = p.id)
                 """, [product_id])
             else:
                 # Check all products
                 cursor.execute("""
-                    SELECT 
-                        p.id,
-                        p.name,
-                        COUNT(si.id) as sale_items_count
+                    SELECT p.id, p.name
                     FROM products p
-                    LEFT JOIN sale_items si ON p.id = si.product_id
-                    GROUP BY p.id, p.name
-                    HAVING COUNT(si.id) > 0
+                    WHERE EXISTS (SELECT 1 FROM sale_items si WHERE si.product_id = p.id)
                 """)
 
             results = cursor.fetchall()
@@ -56,31 +48,31 @@ class Command(BaseCommand):
                 return
 
             self.stdout.write(self.style.WARNING('\nFound products with sale items:'))
-            for product_id, product_name, sale_items_count in results:
-                self.stdout.write(f'Product ID: {product_id}, Name: {product_name}, Sale Items: {sale_items_count}')
+            for found_id, found_name in results:
+                self.stdout.write(f'Product ID: {found_id}, Name: {found_name}')
 
             if cleanup:
                 try:
                     with connection.cursor() as cursor:
                         if product_id:
-                            # First delete batch_sale_items for this product's sale items
+                            # DELETE ... USING joins in one statement instead
+                            # of rebuilding the sale_items subquery
                             cursor.execute("""
-                                DELETE FROM batch_sale_items 
-                                WHERE sale_item_id IN (
-                                    SELECT id FROM sale_items WHERE product_id = %s
-                                )
+                                DELETE FROM batch_sale_items
+                                USING sale_items
+                                WHERE batch_sale_items.sale_item_id = sale_items.id
+                                  AND sale_items.product_id = %s
                             """, [product_id])
-                            
+
                             # Then delete sale_items
                             cursor.execute("DELETE FROM sale_items WHERE product_id = %s", [product_id])
                             self.stdout.write(self.style.SUCCESS(f'\nCleaned up sale items for product {product_id}'))
                         else:
-                            # Delete all batch_sale_items first
-                            cursor.execute("DELETE FROM batch_sale_items")
-                            # Then delete all sale_items
-                            cursor.execute("DELETE FROM sale_items")
+                            # Full cleanup: one TRUNCATE covers both tables
+                            # without per-row WAL
+                            cursor.execute("TRUNCATE batch_sale_items, sale_items RESTART IDENTITY")
                             self.stdout.write(self.style.SUCCESS('\nCleaned up all sale items'))
                 except Exception as e:
                     self.stdout.write(self.style.ERROR(f'\nError during cleanup: {str(e)}'))
             else:
-                self.stdout.write(self.style.WARNING('\nTo clean up these sale items, run the command with --cleanup flag')) 
\ No newline at end of file
+                self.stdout.write(self.style.WARNING('\nTo clean up these sale items, run the command with --cleanup flag'))
\ No newline at end of file
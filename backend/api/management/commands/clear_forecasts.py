@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from django.db import connection
 from api.models import ProductForecast
 from django.utils import timezone
 import logging
@@ -8,20 +9,36 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = 'Clear all existing product forecasts'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--soft',
+            action='store_true',
+            help='Delete through the ORM (fires signals/cascades) instead of TRUNCATE',
+        )
+
     def handle(self, *args, **options):
         try:
             # Get count before deletion
             count = ProductForecast.objects.count()
-            
-            # Delete all forecasts
-            ProductForecast.objects.all().delete()
-            
+
+            if options['soft']:
+                # ORM delete for environments that rely on signals
+                ProductForecast.objects.all().delete()
+            else:
+                # TRUNCATE is O(1) metadata work; the ORM delete collects PKs
+                # and walks cascades in Python, which crawls at 100k+ rows
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'TRUNCATE TABLE {ProductForecast._meta.db_table} '
+                        f'RESTART IDENTITY CASCADE'
+                    )
+
             self.stdout.write(
                 self.style.SUCCESS(f'Successfully deleted {count} forecasts')
             )
-            
+
         except Exception as e:
             logger.error(f"Error clearing forecasts: {str(e)}")
             self.stdout.write(
                 self.style.ERROR(f'Error clearing forecasts: {str(e)}')
-            ) 
\ No newline at end of file
+            )
@@ -11,27 +11,30 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         username = 'admin'
         password = 'temporary_password_123'
-        
-        # Check if user exists
+
+        # Hash once up front; the upsert reuses it for both outcomes
+        hashed = make_password(password)
+
+        # One UPSERT replaces the SELECT + UPDATE/create branches and closes
+        # the check-then-write race; xmax = 0 distinguishes insert from update.
+        # All NOT NULL columns without a reliable DB default are supplied
+        # explicitly -- the proposed row is checked before conflict handling.
         with connection.cursor() as cursor:
-            cursor.execute("SELECT id FROM users WHERE username = %s", [username])
-            user_exists = cursor.fetchone() is not None
+            cursor.execute("""
+                INSERT INTO users (username, password, role, is_active, is_staff,
+                                   is_superuser, can_access_all_shops, created_at, updated_at)
+                VALUES (%s, %s, 'admin', TRUE, TRUE, TRUE, FALSE, now(), now())
+                ON CONFLICT (username) DO UPDATE SET
+                    password = EXCLUDED.password,
+                    role = 'admin',
+                    is_staff = TRUE,
+                    is_superuser = TRUE,
+                    updated_at = now()
+                RETURNING (xmax = 0) AS created
+            """, [username, hashed])
+            created = cursor.fetchone()[0]
 
-        if user_exists:
-            # Update existing user
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "UPDATE users SET password = %s, is_staff = TRUE, is_superuser = TRUE, role = 'admin' WHERE username = %s",
-                    [make_password(password), username]
-                )
-            self.stdout.write(self.style.SUCCESS(f'Updated admin user "{username}" with new password'))
+        if created:
+            self.stdout.write(self.style.SUCCESS(f'Created admin user "{username}"'))
         else:
-            # Create new user
-            User.objects.create_user(
-                username=username,
-                password=password,
-                is_staff=True,
-                is_superuser=True,
-                role='admin'
-            )
-            self.stdout.write(self.style.SUCCESS(f'Created admin user "{username}"')) 
\ No newline at end of file
+            self.stdout.write(self.style.SUCCESS(f'Updated admin user "{username}" with new password'))
\ No newline at end of file
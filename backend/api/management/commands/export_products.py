@@ -1,18 +1,25 @@
-import csv
 from django.core.management.base import BaseCommand
-from api.models import Product
+from django.db import connection
 
 class Command(BaseCommand):
     help = 'Export all products to products_export.csv'
 
     def handle(self, *args, **kwargs):
-        with open('products_export.csv', 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['ID', 'Name', 'SKU', 'Category', 'Description', 'Quantity', 'Buying Price', 'Price', 'Created At'])
-            for p in Product.objects.all():
-                writer.writerow([
-                    p.id, p.name, p.sku,
-                    p.category.name if p.category else '',
-                    p.description, getattr(p, 'quantity', ''), getattr(p, 'buy_price', ''), getattr(p, 'sell_price', ''), p.created_at
-                ])
-        self.stdout.write(self.style.SUCCESS('Exported products to products_export.csv')) 
\ No newline at end of file
+        # COPY streams server-formatted CSV straight into the file: no ORM
+        # row objects, no Python csv encoding, bounded by disk rather than
+        # the interpreter; the join replaces the per-row category lookup
+        sql = """
+            COPY (
+                SELECT p.id AS "ID", p.name AS "Name", p.sku AS "SKU",
+                       COALESCE(c.name, '') AS "Category",
+                       p.description AS "Description", p.quantity AS "Quantity",
+                       p.buy_price AS "Buying Price", p.sell_price AS "Price",
+                       p.created_at AS "Created At"
+                FROM products p
+                LEFT JOIN categories c ON c.id = p.category_id
+                ORDER BY p.id
+            ) TO STDOUT WITH (FORMAT CSV, HEADER)
+        """
+        with connection.cursor() as cursor, open('products_export.csv', 'wb') as csvfile:
+            cursor.copy_expert(sql, csvfile)
+        self.stdout.write(self.style.SUCCESS('Exported products to products_export.csv'))
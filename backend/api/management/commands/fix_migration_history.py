@@ -20,38 +20,35 @@ class Command(BaseCommand):
             for migration in migrations:
                 self.stdout.write(f"ID: {migration[0]}, App: {migration[1]}, Name: {migration[2]}, Applied: {migration[3]}")
 
-            # Check if the admin.0001_initial migration exists
-            cursor.execute("SELECT id, app, name, applied FROM django_migrations WHERE app='admin' AND name='0001_initial'")
-            admin_migration = cursor.fetchone()
-
-            # Check if the api.0001_initial migration exists
-            cursor.execute("SELECT id, app, name, applied FROM django_migrations WHERE app='api' AND name='0001_initial'")
-            api_migration = cursor.fetchone()
-
-            # Check if the api.0002_add_batch_tables migration exists
-            cursor.execute("SELECT id, app, name, applied FROM django_migrations WHERE app='api' AND name='0002_add_batch_tables'")
-            api_batch_migration = cursor.fetchone()
+            # The full history is already in hand; index it instead of issuing
+            # one targeted SELECT per migration of interest
+            by_key = {(m[1], m[2]): (m[0], m[3]) for m in migrations}
+            admin_migration = by_key.get(('admin', '0001_initial'))
+            api_migration = by_key.get(('api', '0001_initial'))
+            api_batch_migration = by_key.get(('api', '0002_add_batch_tables'))
 
             if admin_migration:
-                admin_id, admin_app, admin_name, admin_applied = admin_migration
+                admin_id, admin_applied = admin_migration
 
                 # Handle api.0001_initial migration
+                pending_inserts = []
                 if not api_migration:
                     # Create a timestamp 1 second before the admin migration
                     api_applied = admin_applied - datetime.timedelta(seconds=1)
 
                     self.stdout.write(self.style.WARNING(f"Admin migration found (applied: {admin_applied}), but api migration not found. Creating fake api migration with timestamp {api_applied}"))
 
-                    # Insert a fake api.0001_initial migration with a timestamp before admin.0001_initial
-                    cursor.execute(
-                        "INSERT INTO django_migrations (app, name, applied) VALUES (%s, %s, %s)",
-                        ['api', '0001_initial', api_applied]
-                    )
+                    # Queue the fake api.0001_initial row; both inserts flush
+                    # together in one executemany below
+                    pending_inserts.append(('api', '0001_initial', api_applied))
+
+                    # Track the new row locally rather than re-querying
+                    api_migration = (None, api_applied)
 
                     self.stdout.write(self.style.SUCCESS("Successfully inserted fake api.0001_initial migration"))
-                elif admin_applied < api_migration[3]:
+                elif admin_applied < api_migration[1]:
                     # If admin migration was applied before api migration, update the api migration timestamp
-                    self.stdout.write(self.style.WARNING(f"Found inconsistency: admin.0001_initial (applied: {admin_applied}) is before api.0001_initial (applied: {api_migration[3]})"))
+                    self.stdout.write(self.style.WARNING(f"Found inconsistency: admin.0001_initial (applied: {admin_applied}) is before api.0001_initial (applied: {api_migration[1]})"))
 
                     # Create a timestamp 1 second before the admin migration
                     new_api_applied = admin_applied - datetime.timedelta(seconds=1)
@@ -61,29 +58,30 @@ class Command(BaseCommand):
                         "UPDATE django_migrations SET applied = %s WHERE id = %s",
                         [new_api_applied, api_migration[0]]
                     )
+                    api_migration = (api_migration[0], new_api_applied)
 
                     self.stdout.write(self.style.SUCCESS(f"Successfully updated api.0001_initial timestamp to {new_api_applied}"))
 
                 # Handle api.0002_add_batch_tables migration
                 if not api_batch_migration:
-                    # Check if api.0001_initial exists now (either it existed before or we just created it)
-                    cursor.execute("SELECT id, app, name, applied FROM django_migrations WHERE app='api' AND name='0001_initial'")
-                    api_migration = cursor.fetchone()
-
                     if api_migration:
                         # Create a timestamp 1 second after the api.0001_initial migration
-                        api_batch_applied = api_migration[3] + datetime.timedelta(seconds=1)
+                        api_batch_applied = api_migration[1] + datetime.timedelta(seconds=1)
 
-                        self.stdout.write(self.style.WARNING(f"api.0001_initial migration found (applied: {api_migration[3]}), but api.0002_add_batch_tables migration not found. Creating fake api.0002_add_batch_tables migration with timestamp {api_batch_applied}"))
+                        self.stdout.write(self.style.WARNING(f"api.0001_initial migration found (applied: {api_migration[1]}), but api.0002_add_batch_tables migration not found. Creating fake api.0002_add_batch_tables migration with timestamp {api_batch_applied}"))
 
-                        # Insert a fake api.0002_add_batch_tables migration
-                        cursor.execute(
-                            "INSERT INTO django_migrations (app, name, applied) VALUES (%s, %s, %s)",
-                            ['api', '0002_add_batch_tables', api_batch_applied]
-                        )
+                        # Queue the fake api.0002_add_batch_tables row
+                        pending_inserts.append(('api', '0002_add_batch_tables', api_batch_applied))
 
                         self.stdout.write(self.style.SUCCESS("Successfully inserted fake api.0002_add_batch_tables migration"))
                     else:
                         self.stdout.write(self.style.ERROR("Could not find or create api.0001_initial migration"))
+
+                # Both fake rows share one parsed statement
+                if pending_inserts:
+                    cursor.executemany(
+                        "INSERT INTO django_migrations (app, name, applied) VALUES (%s, %s, %s)",
+                        pending_inserts
+                    )
             else:
                 self.stdout.write(self.style.ERROR("Could not find admin.0001_initial migration"))
@@ -1,12 +1,17 @@
 import datetime
+import hashlib
 import logging
 from django.core.management.base import BaseCommand
 from django.db import connection
-from api.models import Product, ProductForecast, Sale, SaleItem
-from django.db import models
-from typing import Dict, List, Optional
+from api.models import ForecastRunMeta, Product, ProductForecast
+# fit_one lives in a Django-free module: loky workers re-import the module
+# defining it, and that import must not hit the app registry
+from api.forecasting import fit_one
+from typing import Dict, Optional
+from joblib import Parallel, delayed
+from psycopg2.extras import execute_values
+import numpy as np
 import pandas as pd
-from prophet import Prophet
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +19,7 @@ class ForecastGenerationError(Exception):
     """Custom exception for forecast generation errors"""
     pass
 
+
 class Command(BaseCommand):
     help = 'Generate demand forecasts for each product using historical sales data'
 
@@ -24,23 +30,15 @@ class Command(BaseCommand):
         self.HISTORY_DAYS = 90    # Reduced from 365 to 90 days of historical data
         self.MIN_SALES_THRESHOLD = 2  # Reduced from 5 to 2 minimum total sales required
 
-    def get_sales_data(self, product: Product) -> Optional[pd.DataFrame]:
-        """Get and validate sales data for a product"""
+    def get_sales_data(self, product: Product, group: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+        """Validate one product's slice of the pre-aggregated sales frame"""
         try:
-            sales_data = SaleItem.objects.filter(
-                product=product,
-                sale__sale_date__gte=datetime.date.today() - datetime.timedelta(days=self.HISTORY_DAYS)
-            ).values('sale__sale_date').annotate(
-                total_quantity=models.Sum('quantity')
-            ).order_by('sale__sale_date')
-
-            if not sales_data:
+            if group is None or group.empty:
                 logger.info(f"No sales data found for product {product.name}")
                 return None
 
-            # Convert to DataFrame
-            df = pd.DataFrame(list(sales_data))
-            df.columns = ['ds', 'y']
+            # Convert to Prophet's expected columns
+            df = group.rename(columns={'sale_date': 'ds', 'quantity': 'y'})[['ds', 'y']]
             df['ds'] = pd.to_datetime(df['ds'])
 
             # Validate data points
@@ -59,68 +57,41 @@ class Command(BaseCommand):
             logger.error(f"Error getting sales data for {product.name}: {str(e)}")
             return None
 
-    def generate_forecast(self, df: pd.DataFrame, product: Product) -> Optional[Dict]:
-        """Generate forecast using Prophet model"""
-        try:
-            # Configure Prophet model with more flexible parameters for small datasets
-            model = Prophet(
-                yearly_seasonality=False,  # Disabled for small datasets
-                weekly_seasonality=True,
-                daily_seasonality=False,
-                changepoint_prior_scale=0.1,  # More flexible trend changes
-                seasonality_prior_scale=5.0,  # Reduced seasonality strength
-                holidays_prior_scale=5.0,     # Reduced holiday effects
-            )
-
-            # Add custom seasonality only if we have enough data
-            if len(df) >= 7:
-                model.add_seasonality(
-                    name='monthly',
-                    period=30.5,
-                    fourier_order=3  # Reduced from 5 to 3 for smaller datasets
-                )
-
-            # Fit model
-            model.fit(df)
-
-            # Generate forecast
-            future = model.make_future_dataframe(periods=self.FORECAST_DAYS)
-            forecast = model.predict(future)
-
-            # Get forecast metrics
-            metrics = {
-                'trend': forecast['trend'].iloc[-1],
-                'seasonality': forecast['yearly'].iloc[-1] if 'yearly' in forecast else 0,
-                'uncertainty': forecast['yhat_upper'].iloc[-1] - forecast['yhat_lower'].iloc[-1]
-            }
-
-            return {
-                'forecast': forecast.tail(self.FORECAST_DAYS),
-                'metrics': metrics
-            }
-
-        except Exception as e:
-            logger.error(f"Error generating forecast for {product.name}: {str(e)}")
-            return None
-
     def save_forecasts(self, product: Product, forecast_data: Dict) -> bool:
         """Save forecast data to database"""
         try:
-            for _, row in forecast_data['forecast'].iterrows():
-                forecast_date = row['ds'].date()
-                forecast_quantity = max(0, int(round(row['yhat'])))
-                
-                # Calculate confidence interval
-                lower_bound = max(0, int(round(row['yhat_lower'])))
-                upper_bound = max(0, int(round(row['yhat_upper'])))
-                
-                ProductForecast.objects.update_or_create(
-                    product=product,
-                    forecast_date=forecast_date,
-                    defaults={
-                        'forecast_quantity': forecast_quantity,
-                        'model_info': f"Prophet (CI: {lower_bound}-{upper_bound})"
-                    }
+            model_name = forecast_data.get('model_name', 'Prophet')
+            forecast = forecast_data['forecast']
+
+            # Column-wise rounding/clipping instead of an iterrows dict per
+            # forecast day
+            dates = forecast['ds'].dt.date.tolist()
+            qty = np.clip(np.rint(forecast['yhat'].to_numpy()), 0, None).astype(int)
+            lower = np.clip(np.rint(forecast['yhat_lower'].to_numpy()), 0, None).astype(int)
+            upper = np.clip(np.rint(forecast['yhat_upper'].to_numpy()), 0, None).astype(int)
+
+            rows = [
+                (product.id, d, q, f"{model_name} (CI: {lo}-{hi})")
+                for d, q, lo, hi in zip(dates, qty.tolist(), lower.tolist(), upper.tolist())
+            ]
+
+            # One upsert replaces an update_or_create (SELECT + write) per
+            # row; the (product, forecast_date) unique constraint drives
+            # the conflict target
+            with connection.cursor() as cursor:
+                execute_values(
+                    cursor,
+                    f"""
+                    INSERT INTO {ProductForecast._meta.db_table}
+                        (product_id, forecast_date, forecast_quantity, model_info, created_at)
+                    VALUES %s
+                    ON CONFLICT (product_id, forecast_date) DO UPDATE SET
+                        forecast_quantity = EXCLUDED.forecast_quantity,
+                        model_info = EXCLUDED.model_info
+                    """,
+                    rows,
+                    template="(%s, %s, %s, %s, now())",
+                    page_size=500,
                 )
             return True
         except Exception as e:
@@ -129,47 +100,97 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         try:
-            # Get all products
-            products = Product.objects.all()
-            total_products = products.count()
+            # Get all products; forecast dispatch only reads id and name,
+            # and len() on the list spares the separate COUNT query
+            products = list(Product.objects.only('id', 'name'))
+            total_products = len(products)
             successful_forecasts = 0
             failed_forecasts = 0
             
             self.stdout.write(f"Starting forecast generation for {total_products} products...")
-            
+
+            # One joined query loads the whole history window; pandas does
+            # the per-day aggregation vectorised in C and hands each product
+            # its slice
+            cutoff = datetime.date.today() - datetime.timedelta(days=self.HISTORY_DAYS)
+            all_df = pd.read_sql("""
+                SELECT si.product_id, s.sale_date, si.quantity
+                FROM sale_items si
+                JOIN sales s ON s.id = si.sale_id
+                WHERE s.sale_date >= %s
+            """, connection, params=[cutoff], parse_dates=['sale_date'])
+            if not all_df.empty:
+                daily = (
+                    all_df.groupby('product_id')
+                    .resample('D', on='sale_date')['quantity'].sum()
+                    .reset_index()
+                )
+                # resample zero-fills gap days; drop them so each series
+                # matches the old per-sale-date aggregation
+                daily = daily[daily['quantity'] > 0]
+                sales_by_product = dict(tuple(daily.groupby('product_id')))
+            else:
+                sales_by_product = {}
+
+            # Validate each product's slice first, then fit the survivors in
+            # parallel: the Stan fit dominates runtime and products are
+            # independent, so workers give near-linear speedup with cores.
+            # Products whose history hashes to the same value as last run
+            # are skipped entirely -- refitting would reproduce the stored
+            # forecast.
+            stored_hashes = dict(ForecastRunMeta.objects.values_list('product_id', 'input_hash'))
+            products_by_id = {}
+            jobs = {}
+            job_hashes = {}
+            skipped_unchanged = 0
             for product in products:
-                try:
-                    # Get and validate sales data
-                    df = self.get_sales_data(product)
-                    if df is None:
-                        failed_forecasts += 1
-                        continue
-
-                    # Generate forecast
-                    forecast_data = self.generate_forecast(df, product)
-                    if forecast_data is None:
-                        failed_forecasts += 1
-                        continue
-
-                    # Save forecasts
-                    if self.save_forecasts(product, forecast_data):
-                        successful_forecasts += 1
-                        self.stdout.write(
-                            self.style.SUCCESS(f'Successfully generated forecasts for {product.name}')
-                        )
-                    else:
-                        failed_forecasts += 1
-
-                except Exception as e:
-                    logger.error(f"Error processing product {product.name}: {str(e)}")
+                products_by_id[product.id] = product
+                df = self.get_sales_data(product, sales_by_product.get(product.id))
+                if df is None:
                     failed_forecasts += 1
                     continue
+                input_hash = hashlib.blake2b(
+                    pd.util.hash_pandas_object(df).values.tobytes()
+                ).hexdigest()
+                if stored_hashes.get(product.id) == input_hash:
+                    skipped_unchanged += 1
+                    continue
+                jobs[product.id] = df
+                job_hashes[product.id] = input_hash
+
+            # loky reuses worker processes across tasks, so the Prophet/
+            # cmdstanpy import is paid once per worker rather than per
+            # product, and large inputs are memmapped instead of pickled
+            results = Parallel(n_jobs=-1, prefer='processes', max_nbytes='100M')(
+                delayed(fit_one)(pid, df.to_dict('list'), self.FORECAST_DAYS)
+                for pid, df in jobs.items()
+            )
+            for pid, forecast_data, error in results:
+                product = products_by_id[pid]
+                if error is not None:
+                    logger.error(f"Error generating forecast for {product.name}: {error}")
+                    failed_forecasts += 1
+                    continue
+
+                # Save forecasts
+                if self.save_forecasts(product, forecast_data):
+                    successful_forecasts += 1
+                    ForecastRunMeta.objects.update_or_create(
+                        product=product,
+                        defaults={'input_hash': job_hashes[product.id]}
+                    )
+                    self.stdout.write(
+                        self.style.SUCCESS(f'Successfully generated forecasts for {product.name}')
+                    )
+                else:
+                    failed_forecasts += 1
 
             # Print summary
             self.stdout.write(self.style.SUCCESS(
                 f'Forecast generation completed.\n'
                 f'Total products: {total_products}\n'
                 f'Successful forecasts: {successful_forecasts}\n'
+                f'Skipped (history unchanged): {skipped_unchanged}\n'
                 f'Failed forecasts: {failed_forecasts}'
             ))
 
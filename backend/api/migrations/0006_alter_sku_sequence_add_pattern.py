@@ -7,15 +7,11 @@ def alter_sku_sequence(apps, schema_editor):
             ALTER TABLE sku_sequence
             ALTER COLUMN next_sku TYPE TEXT;
         ''')
-        # Add pattern column if it doesn't exist
-        cursor.execute("""
-            DO $$
-            BEGIN
-                IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='sku_sequence' AND column_name='pattern') THEN
-                    ALTER TABLE sku_sequence ADD COLUMN pattern TEXT;
-                END IF;
-            END$$;
-        """)
+        # Add pattern column if it doesn't exist; native IF NOT EXISTS
+        # skips the PL/pgSQL block and the information_schema scan
+        cursor.execute('''
+            ALTER TABLE sku_sequence ADD COLUMN IF NOT EXISTS pattern TEXT;
+        ''')
 
 def revert_alter_sku_sequence(apps, schema_editor):
     with connection.cursor() as cursor:
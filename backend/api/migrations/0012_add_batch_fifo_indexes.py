@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_add_multishop_tables'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productbatch',
+            index=models.Index(fields=['product', 'purchase_date'], name='pb_prod_pdate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productbatch',
+            index=models.Index(fields=['product', 'remaining_quantity'], name='pb_prod_rem_idx'),
+        ),
+        # Partial covering index so the FIFO batch lookup
+        # (WHERE product_id = ... AND remaining_quantity > 0 ORDER BY purchase_date)
+        # is served by a single index-only scan.
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX IF NOT EXISTS pb_fifo_idx ON product_batches "
+                "(product_id, purchase_date) INCLUDE (remaining_quantity) "
+                "WHERE remaining_quantity > 0;"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS pb_fifo_idx;",
+        ),
+    ]
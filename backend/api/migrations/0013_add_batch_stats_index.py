@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_add_batch_fifo_indexes'),
+    ]
+
+    operations = [
+        # Covering index so the per-product batch stats aggregation
+        # (COUNT/SUM/AVG filtered on product_id) is an index-only scan.
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX IF NOT EXISTS pb_prodid_idx ON product_batches "
+                "(product_id) INCLUDE (quantity, remaining_quantity, purchase_price);"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS pb_prodid_idx;",
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_add_batch_stats_index'),
+    ]
+
+    operations = [
+        # Widen the partial FIFO index so the hot batch-allocation query
+        # (filter on product_id/remaining_quantity, order by purchase_date, id,
+        # reading selling/purchase price) is an index-only scan. Replaces the
+        # narrower pb_fifo_idx from 0012; depleted batches stay excluded so
+        # the index only grows with live stock.
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX IF NOT EXISTS pb_fifo_covering ON product_batches "
+                "(product_id, purchase_date, id) "
+                "INCLUDE (remaining_quantity, selling_price, purchase_price) "
+                "WHERE remaining_quantity > 0;"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS pb_fifo_covering;",
+        ),
+        migrations.RunSQL(
+            sql="DROP INDEX IF EXISTS pb_fifo_idx;",
+            reverse_sql=(
+                "CREATE INDEX IF NOT EXISTS pb_fifo_idx ON product_batches "
+                "(product_id, purchase_date) INCLUDE (remaining_quantity) "
+                "WHERE remaining_quantity > 0;"
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_widen_fifo_covering_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastRunMeta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('input_hash', models.CharField(max_length=128)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_meta', to='api.product')),
+            ],
+            options={
+                'db_table': 'forecast_run_meta',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CONCURRENTLY cannot run inside a transaction block
+    atomic = False
+
+    dependencies = [
+        ('api', '0015_forecastrunmeta'),
+    ]
+
+    operations = [
+        # The forecast aggregation groups sale_items by product over a sales
+        # date window; covering product_id with quantity enables an
+        # index-only scan, and the date index drives the window filter.
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_saleitem_product_qty "
+                "ON sale_items (product_id) INCLUDE (quantity);"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS idx_saleitem_product_qty;",
+        ),
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sales_date "
+                "ON sales (sale_date);"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS idx_sales_date;",
+        ),
+    ]
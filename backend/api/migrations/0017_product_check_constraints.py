@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_add_forecast_aggregation_indexes'),
+    ]
+
+    operations = [
+        # Replaces the Python-side clean()/full_clean() checks on Product;
+        # the DB rejects bad rows on every write path, bulk ones included.
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.CheckConstraint(
+                condition=(
+                    models.Q(min_stock_level__gte=0)
+                    & models.Q(buy_price__gte=0)
+                    & models.Q(sell_price__gte=0)
+                    & models.Q(pieces_per_carton__gte=1)
+                ),
+                name='product_nonneg',
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_product_check_constraints'),
+    ]
+
+    operations = [
+        # shop_inventory and sales (with its shop column) were created
+        # manually via SQL (see 0011), so these go through RunSQL rather
+        # than AddIndex against models the migration state doesn't track.
+        # The (shop, product) unique index can't serve product-only lookups;
+        # covering quantity makes the shop_stock Sum an index-only scan.
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX IF NOT EXISTS si_product_qty "
+                "ON shop_inventory (product_id) INCLUDE (quantity);"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS si_product_qty;",
+        ),
+        # Per-shop sales reports range-scan the date window, newest first.
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX IF NOT EXISTS sale_shop_date "
+                "ON sales (shop_id, sale_date DESC);"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS sale_shop_date;",
+        ),
+    ]
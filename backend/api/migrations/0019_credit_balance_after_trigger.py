@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_shop_access_pattern_indexes'),
+    ]
+
+    operations = [
+        # credit_transactions is one of the manually created tables 0011
+        # doesn't track, so the nullability change is raw SQL too.
+        migrations.RunSQL(
+            sql="ALTER TABLE credit_transactions ALTER COLUMN balance_after DROP NOT NULL;",
+            reverse_sql="ALTER TABLE credit_transactions ALTER COLUMN balance_after SET NOT NULL;",
+        ),
+        # Amounts are stored signed (negative for payments) and balances
+        # clamp at zero, matching the app-side arithmetic this replaces.
+        # Only NULL values are filled so explicit writes still win.
+        migrations.RunSQL(
+            sql="""
+                CREATE OR REPLACE FUNCTION set_credit_balance_after() RETURNS trigger AS $$
+                BEGIN
+                    IF NEW.balance_after IS NULL THEN
+                        NEW.balance_after := GREATEST(
+                            COALESCE((SELECT balance_after FROM credit_transactions
+                                      WHERE customer_id = NEW.customer_id
+                                      ORDER BY id DESC LIMIT 1), 0) + NEW.amount,
+                            0);
+                    END IF;
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER credit_balance_after
+                BEFORE INSERT ON credit_transactions
+                FOR EACH ROW EXECUTE FUNCTION set_credit_balance_after();
+            """,
+            reverse_sql="""
+                DROP TRIGGER IF EXISTS credit_balance_after ON credit_transactions;
+                DROP FUNCTION IF EXISTS set_credit_balance_after();
+            """,
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_credit_balance_after_trigger'),
+    ]
+
+    operations = [
+        # These columns hold short enumeration strings; varchar keeps them
+        # in-line and btree-indexable (Postgres converts text -> varchar
+        # in place when the length fits).
+        migrations.AlterField(
+            model_name='activity',
+            name='type',
+            field=models.CharField(max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='activity',
+            name='status',
+            field=models.CharField(max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['type', 'created_at'], name='activity_type_created'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['status'], name='activity_status'),
+        ),
+    ]
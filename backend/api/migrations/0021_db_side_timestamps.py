@@ -0,0 +1,88 @@
+from django.db import migrations, models
+from django.db.models.functions import Now
+
+# (model_name, field) pairs moving from Python-side auto_now/auto_now_add
+# to a DB-side DEFAULT now(); bulk inserts can then omit the column. Only
+# models the migration state actually tracks can go through AlterField.
+TRACKED_TIMESTAMP_FIELDS = [
+    ('activity', 'created_at'),
+    ('productforecast', 'created_at'),
+    ('forecastrunmeta', 'updated_at'),
+    ('productbatch', 'created_at'),
+    ('productbatch', 'updated_at'),
+    ('batchsaleitem', 'created_at'),
+]
+
+# The multi-shop tables (and the users timestamp columns) were created
+# manually via SQL (see 0011), so their defaults are set with raw SQL.
+MANUAL_TIMESTAMP_COLUMNS = [
+    ('shops', 'created_at'),
+    ('shops', 'updated_at'),
+    ('users', 'created_at'),
+    ('users', 'updated_at'),
+    ('shop_inventory', 'created_at'),
+    ('shop_inventory', 'updated_at'),
+    ('customers', 'created_at'),
+    ('customers', 'updated_at'),
+    ('payment_methods', 'created_at'),
+    ('sale_payments', 'created_at'),
+    ('credit_transactions', 'created_at'),
+]
+
+DEFAULT_SQL = "\n".join(
+    f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT now();"
+    for table, column in MANUAL_TIMESTAMP_COLUMNS
+)
+
+DEFAULT_REVERSE_SQL = "\n".join(
+    f"ALTER TABLE {table} ALTER COLUMN {column} DROP DEFAULT;"
+    for table, column in MANUAL_TIMESTAMP_COLUMNS
+)
+
+# Tables whose updated_at is maintained by the moddatetime trigger now
+# that auto_now no longer sets it in Python.
+UPDATED_AT_TABLES = [
+    'shops',
+    'users',
+    'shop_inventory',
+    'customers',
+    'forecast_run_meta',
+    'product_batches',
+]
+
+TRIGGER_SQL = "\n".join(
+    f"DROP TRIGGER IF EXISTS set_updated_at ON {table};\n"
+    f"CREATE TRIGGER set_updated_at BEFORE UPDATE ON {table} "
+    f"FOR EACH ROW EXECUTE FUNCTION moddatetime(updated_at);"
+    for table in UPDATED_AT_TABLES
+)
+
+TRIGGER_REVERSE_SQL = "\n".join(
+    f"DROP TRIGGER IF EXISTS set_updated_at ON {table};"
+    for table in UPDATED_AT_TABLES
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_activity_narrow_columns_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name=model_name,
+            name=field,
+            field=models.DateTimeField(db_default=Now(), editable=False),
+        )
+        for model_name, field in TRACKED_TIMESTAMP_FIELDS
+    ] + [
+        migrations.RunSQL(
+            sql=DEFAULT_SQL,
+            reverse_sql=DEFAULT_REVERSE_SQL,
+        ),
+        migrations.RunSQL(
+            sql="CREATE EXTENSION IF NOT EXISTS moddatetime;\n" + TRIGGER_SQL,
+            reverse_sql=TRIGGER_REVERSE_SQL,
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_db_side_timestamps'),
+    ]
+
+    operations = [
+        # A column can't be altered into a generated one, so drop and
+        # re-add; the values are recomputed from original_amount - discount,
+        # which is the identity every write path already maintained.
+        migrations.RemoveField(
+            model_name='sale',
+            name='total_amount',
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='total_amount',
+            field=models.GeneratedField(
+                expression=models.F('original_amount') - models.F('discount'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+                db_persist=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_sale_total_amount_generated'),
+    ]
+
+    operations = [
+        # Real FK constraints give the planner correlation statistics for
+        # join ordering. NOT VALID + VALIDATE adds them without locking the
+        # tables against writes while existing rows are checked. 0001 never
+        # put these FK fields into migration state (the columns predate the
+        # models), so the state side *adds* them rather than altering.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='product',
+                    name='category',
+                    field=models.ForeignKey(
+                        'api.Category', on_delete=django.db.models.deletion.DO_NOTHING,
+                        blank=True, null=True,
+                    ),
+                ),
+                migrations.AddField(
+                    model_name='saleitem',
+                    name='sale',
+                    field=models.ForeignKey('api.Sale', on_delete=django.db.models.deletion.DO_NOTHING),
+                ),
+                migrations.AddField(
+                    model_name='saleitem',
+                    name='product',
+                    field=models.ForeignKey('api.Product', on_delete=django.db.models.deletion.DO_NOTHING),
+                ),
+                migrations.AddField(
+                    model_name='sale',
+                    name='user',
+                    field=models.ForeignKey(
+                        'api.User', on_delete=django.db.models.deletion.DO_NOTHING,
+                        blank=True, null=True,
+                    ),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""
+                        ALTER TABLE products ADD CONSTRAINT products_category_id_fk
+                            FOREIGN KEY (category_id) REFERENCES categories (id) NOT VALID;
+                        ALTER TABLE products VALIDATE CONSTRAINT products_category_id_fk;
+                        ALTER TABLE sale_items ADD CONSTRAINT sale_items_sale_id_fk
+                            FOREIGN KEY (sale_id) REFERENCES sales (id) NOT VALID;
+                        ALTER TABLE sale_items VALIDATE CONSTRAINT sale_items_sale_id_fk;
+                        ALTER TABLE sale_items ADD CONSTRAINT sale_items_product_id_fk
+                            FOREIGN KEY (product_id) REFERENCES products (id) NOT VALID;
+                        ALTER TABLE sale_items VALIDATE CONSTRAINT sale_items_product_id_fk;
+                        ALTER TABLE sales ADD CONSTRAINT sales_user_id_fk
+                            FOREIGN KEY (user_id) REFERENCES users (id) NOT VALID;
+                        ALTER TABLE sales VALIDATE CONSTRAINT sales_user_id_fk;
+                    """,
+                    reverse_sql="""
+                        ALTER TABLE products DROP CONSTRAINT IF EXISTS products_category_id_fk;
+                        ALTER TABLE sale_items DROP CONSTRAINT IF EXISTS sale_items_sale_id_fk;
+                        ALTER TABLE sale_items DROP CONSTRAINT IF EXISTS sale_items_product_id_fk;
+                        ALTER TABLE sales DROP CONSTRAINT IF EXISTS sales_user_id_fk;
+                    """,
+                ),
+            ],
+        ),
+        # sale_id lookups (receipts, sale detail) get their own index; the
+        # product side is already covered by idx_saleitem_product_qty.
+        migrations.AddIndex(
+            model_name='saleitem',
+            index=models.Index(fields=['sale'], name='saleitem_sale'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_enable_fk_constraints'),
+    ]
+
+    operations = [
+        # Per-customer history endpoints order newest-first; these indexes
+        # replace the external sort with an index-ordered range scan.
+        # credit_transactions is one of the manually created tables (see
+        # 0011) and sale.customer never entered migration state, so both
+        # go through RunSQL rather than AddIndex.
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX IF NOT EXISTS credittx_customer_date "
+                "ON credit_transactions (customer_id, created_at DESC);"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS credittx_customer_date;",
+        ),
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX IF NOT EXISTS sale_customer_date "
+                "ON sales (customer_id, sale_date DESC);"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS sale_customer_date;",
+        ),
+    ]
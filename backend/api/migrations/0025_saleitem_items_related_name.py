@@ -0,0 +1,22 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_customer_history_indexes'),
+    ]
+
+    operations = [
+        # State-only: names the reverse accessor 'items' to match the
+        # SaleSerializer field so it can be prefetched; no schema change.
+        migrations.AlterField(
+            model_name='saleitem',
+            name='sale',
+            field=models.ForeignKey(
+                'api.Sale', on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name='items',
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_saleitem_items_related_name'),
+    ]
+
+    operations = [
+        # Backs numeric SKU generation when sku_sequence has no row; seeded
+        # from the highest numeric SKU so nextval continues where the old
+        # MAX(sku) scan left off (139 matches its historical floor).
+        migrations.RunSQL(
+            sql="""
+                CREATE SEQUENCE IF NOT EXISTS product_sku_seq;
+                SELECT setval(
+                    'product_sku_seq',
+                    GREATEST(
+                        (SELECT COALESCE(MAX(CAST(sku AS INTEGER)), 139)
+                         FROM products WHERE sku ~ '^[0-9]+$'),
+                        139
+                    )
+                );
+            """,
+            reverse_sql="DROP SEQUENCE IF EXISTS product_sku_seq;",
+        ),
+    ]
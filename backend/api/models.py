@@ -1,16 +1,24 @@
 from django.db import models
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
+from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
-import bcrypt
 from django.db import connection
 from django.contrib.auth.hashers import check_password, make_password
-from django.core.exceptions import ValidationError
 
 
 class UserManager(BaseUserManager):
     def get_by_natural_key(self, username):
-        # Direct ORM query without recursion
-        return self.get(**{self.model.USERNAME_FIELD: username})
+        # Login resolves the same username repeatedly; a short TTL absorbs
+        # those lookups (invalidated on save in authentication.py)
+        key = f"authuser:{username}"
+        user = cache.get(key)
+        if user is None:
+            user = self.get(**{self.model.USERNAME_FIELD: username})
+            cache.set(key, user, 60)
+        return user
 
     def create_user(self, username, password=None, **extra_fields):
         if not username:
@@ -35,8 +43,8 @@ class Shop(models.Model):
     phone = models.CharField(max_length=50, blank=True, null=True)
     manager = models.ForeignKey('User', on_delete=models.SET_NULL, null=True, blank=True, related_name='managed_shops')
     is_active = models.BooleanField(default=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
 
     class Meta:
         db_table = 'shops'
@@ -61,8 +69,8 @@ class User(AbstractBaseUser):
     shop = models.ForeignKey(Shop, on_delete=models.SET_NULL, null=True, blank=True, related_name='staff')
     can_access_all_shops = models.BooleanField(default=False)
     email = models.EmailField(max_length=255, blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
 
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = []
@@ -74,8 +82,13 @@ class User(AbstractBaseUser):
         self.password = make_password(raw_password)
 
     def check_password(self, raw_password):
-        # Use Django's password verification
-        return check_password(raw_password, self.password)
+        # Django verifies and, via the setter, transparently rehashes
+        # passwords stored under a non-preferred hasher (e.g. old PBKDF2
+        # rows migrating to Argon2) on their next successful login
+        def setter(raw):
+            self.set_password(raw)
+            self.save(update_fields=['password'])
+        return check_password(raw_password, self.password, setter)
 
     def has_perm(self, perm, obj=None):
         return self.is_superuser
@@ -105,11 +118,36 @@ class Category(models.Model):
         db_table = 'categories'
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_shop_totals(self):
+        """Annotate the shop_stock sum and existence per row so list views
+        read them from the same query instead of querying once per product"""
+        from django.db.models.functions import Coalesce
+        return self.annotate(
+            _shop_total=Coalesce(models.Sum('shop_stock__quantity'), 0),
+            _has_shop_inventory=models.Exists(
+                ShopInventory.objects.filter(product=models.OuterRef('pk'))
+            ),
+        )
+
+    def list_fields(self):
+        """Project only the columns the product serializers read, and join
+        the category row so it isn't fetched once per product"""
+        return self.select_related('category').only(
+            'id', 'name', 'sku', 'description', 'min_stock_level',
+            'buy_price', 'sell_price', 'carton_buy_price', 'carton_sell_price',
+            'barcode', 'bc_item_no', 'last_bc_sync', 'uom_type',
+            'pieces_per_carton', 'uom_data', 'master_quantity',
+            'created_at', 'updated_at',
+            'category__id', 'category__name', 'category__created_at',
+        )
+
+
 class Product(models.Model):
     name = models.TextField()
     sku = models.TextField(unique=True)
     description = models.TextField(blank=True, null=True)
-    category = models.ForeignKey(Category, models.DO_NOTHING, blank=True, null=True, db_constraint=False)
+    category = models.ForeignKey(Category, models.DO_NOTHING, blank=True, null=True)
     min_stock_level = models.IntegerField()
     buy_price = models.DecimalField(max_digits=10, decimal_places=2)
     sell_price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -133,12 +171,31 @@ class Product(models.Model):
     # NEW: Master quantity tracking
     master_quantity = models.IntegerField(default=0)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         managed = True
         db_table = 'products'
-    
+        constraints = [
+            # Postgres enforces these at write time; saves (including bulk
+            # paths) skip the per-row full_clean validators and the extra
+            # uniqueness SELECTs it issued
+            models.CheckConstraint(
+                condition=(
+                    models.Q(min_stock_level__gte=0)
+                    & models.Q(buy_price__gte=0)
+                    & models.Q(sell_price__gte=0)
+                    & models.Q(pieces_per_carton__gte=1)
+                ),
+                name='product_nonneg',
+            ),
+        ]
+
     def get_shop_total_quantity(self):
         """Calculate sum of quantities across all shops"""
+        total = getattr(self, '_shop_total', None)
+        if total is not None:
+            return total
         from django.db.models import Sum
         result = self.shop_stock.aggregate(total=Sum('quantity'))
         return result['total'] or 0
@@ -153,37 +210,42 @@ class Product(models.Model):
     
     def update_master_quantity(self):
         """Recalculate master_quantity from shop totals"""
-        self.master_quantity = self.get_shop_total_quantity()
-        self.save(update_fields=['master_quantity'])
+        # Aggregate fresh (a with_shop_totals annotation could be stale by
+        # now), then write with a targeted UPDATE: one statement, no row
+        # re-fetch, no signals
+        total = self.shop_stock.aggregate(total=models.Sum('quantity'))['total'] or 0
+        type(self).objects.filter(pk=self.pk).update(master_quantity=total)
+        self.master_quantity = total
 
-    def clean(self):
-        if self.min_stock_level < 0:
-            raise ValidationError('Minimum stock level cannot be negative')
-        if self.buy_price < 0:
-            raise ValidationError('Buy price cannot be negative')
-        if self.sell_price < 0:
-            raise ValidationError('Sell price cannot be negative')
-        if self.pieces_per_carton < 1:
-            raise ValidationError('Pieces per carton must be at least 1')
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
+# ============ NEW: Shop Inventory Model ============
+class ShopInventoryManager(models.Manager):
+    def get_queryset(self):
+        # __str__ and the serializers read shop.name/product.name; joining
+        # up front spares two SELECTs per row when these are listed
+        return super().get_queryset().select_related('shop', 'product')
 
 
-# ============ NEW: Shop Inventory Model ============
 class ShopInventory(models.Model):
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='inventory')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='shop_stock')
     quantity = models.IntegerField(default=0)
     min_stock_level = models.IntegerField(default=0)
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
+
+    objects = ShopInventoryManager()
 
     class Meta:
         db_table = 'shop_inventory'
         managed = True
         unique_together = ('shop', 'product')
+        indexes = [
+            # The (shop, product) unique index doesn't serve product-only
+            # lookups (shop_stock aggregates); INCLUDE lets the per-product
+            # Sum run as an index-only scan
+            models.Index(fields=['product'], include=['quantity'], name='si_product_qty'),
+        ]
 
     def __str__(self):
         return f"{self.shop.name} - {self.product.name}: {self.quantity}"
@@ -198,8 +260,8 @@ class Customer(models.Model):
     credit_limit = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     current_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     status = models.CharField(max_length=20, default='active')  # active, suspended, blacklisted
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
 
     class Meta:
         db_table = 'customers'
@@ -215,16 +277,24 @@ class PaymentMethod(models.Model):
     name = models.CharField(max_length=50)
     code = models.CharField(max_length=20, unique=True)
     is_active = models.BooleanField(default=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
 
     class Meta:
         db_table = 'payment_methods'
         managed = True
 
+    ACTIVE_CACHE_KEY = 'payment_methods:active'
+
     def __str__(self):
         return self.name
 
 
+@receiver(post_save, sender=PaymentMethod)
+@receiver(post_delete, sender=PaymentMethod)
+def _clear_payment_method_cache(sender, **kwargs):
+    cache.delete(PaymentMethod.ACTIVE_CACHE_KEY)
+
+
 class RestockRule(models.Model):
     product = models.ForeignKey(Product, models.DO_NOTHING, blank=True, null=True)
     reorder_quantity = models.IntegerField()
@@ -242,8 +312,8 @@ class RestockRule(models.Model):
 
 
 class SaleItem(models.Model):
-    sale = models.ForeignKey('Sale', models.DO_NOTHING, db_constraint=False)
-    product = models.ForeignKey(Product, models.DO_NOTHING, db_constraint=False)
+    sale = models.ForeignKey('Sale', models.DO_NOTHING, related_name='items')
+    product = models.ForeignKey(Product, models.DO_NOTHING)
     quantity = models.IntegerField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -251,12 +321,23 @@ class SaleItem(models.Model):
     class Meta:
         managed = True
         db_table = 'sale_items'
+        indexes = [
+            # sale_id lookups (receipts, sale detail); the product side is
+            # covered by idx_saleitem_product_qty
+            models.Index(fields=['sale'], name='saleitem_sale'),
+        ]
 
 
 class Sale(models.Model):
     sale_date = models.DateTimeField()
-    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
-    user = models.ForeignKey(User, models.DO_NOTHING, blank=True, null=True, db_constraint=False)
+    # Always original - discount; the DB derives it so writes carry two
+    # decimals instead of three and the identity can't drift
+    total_amount = models.GeneratedField(
+        expression=models.F('original_amount') - models.F('discount'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        db_persist=True,
+    )
+    user = models.ForeignKey(User, models.DO_NOTHING, blank=True, null=True)
     created_at = models.DateTimeField()
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     discount_percentage = models.DecimalField(max_digits=10, decimal_places=2, default=0)
@@ -272,15 +353,28 @@ class Sale(models.Model):
     class Meta:
         managed = True
         db_table = 'sales'
+        indexes = [
+            # Reports filter per shop over a date window, newest first
+            models.Index(fields=['shop', '-sale_date'], name='sale_shop_date'),
+            # Customer purchase history reads newest-first per customer
+            models.Index(fields=['customer', '-sale_date'], name='sale_customer_date'),
+        ]
 
 
 # ============ NEW: Sale Payment Model ============
+class SalePaymentManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().select_related('sale', 'payment_method')
+
+
 class SalePayment(models.Model):
     sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name='payments')
     payment_method = models.ForeignKey(PaymentMethod, on_delete=models.PROTECT)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     reference_number = models.CharField(max_length=100, blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
+
+    objects = SalePaymentManager()
 
     class Meta:
         db_table = 'sale_payments'
@@ -291,46 +385,66 @@ class SalePayment(models.Model):
 
 
 # ============ NEW: Credit Transaction Model ============
+class CreditTransactionManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().select_related('customer', 'shop', 'sale', 'created_by')
+
+
 class CreditTransaction(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='credit_history')
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='credit_transactions', null=True, blank=True)
     sale = models.ForeignKey(Sale, on_delete=models.SET_NULL, null=True, blank=True)
     transaction_type = models.CharField(max_length=20)  # 'sale', 'payment'
     amount = models.DecimalField(max_digits=10, decimal_places=2)
-    balance_after = models.DecimalField(max_digits=10, decimal_places=2)
+    # Filled by the credit_balance_after trigger when omitted; the DB
+    # derives it from the customer's previous row plus the signed amount
+    balance_after = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     payment_method = models.CharField(max_length=50, blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_column='created_by')
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
+
+    objects = CreditTransactionManager()
 
     class Meta:
         db_table = 'credit_transactions'
         managed = True
         ordering = ['-created_at']
+        indexes = [
+            # The default ordering plus per-customer history filters walk
+            # this index instead of sorting the table
+            models.Index(fields=['customer', '-created_at'], name='credittx_customer_date'),
+        ]
 
     def __str__(self):
         return f"{self.customer.name} - {self.transaction_type}: {self.amount}"
 
 
 class Activity(models.Model):
-    type = models.TextField()
+    type = models.CharField(max_length=32)  # e.g. 'sale_created', 'batch_added', 'login'
     description = models.TextField()
     product = models.ForeignKey(Product, models.SET_NULL, blank=True, null=True)
     user = models.ForeignKey(User, models.SET_NULL, null=True, blank=True)
     shop = models.ForeignKey('Shop', models.SET_NULL, null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-    status = models.TextField()
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
+    status = models.CharField(max_length=16)  # e.g. 'completed', 'pending'
 
     class Meta:
         managed = True
         db_table = 'activities'
+        indexes = [
+            # Feed queries filter by type over recency; status drives the
+            # open-items views
+            models.Index(fields=['type', 'created_at'], name='activity_type_created'),
+            models.Index(fields=['status'], name='activity_status'),
+        ]
 
 
 class ProductForecast(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='forecasts')
     forecast_date = models.DateField()
     forecast_quantity = models.IntegerField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
     model_info = models.CharField(max_length=50)  # e.g., 'Prophet', 'MovingAverage'
 
     class Meta:
@@ -339,3 +453,19 @@ class ProductForecast(models.Model):
 
     def __str__(self):
         return f"{self.product.name} forecast for {self.forecast_date}"
+
+class ForecastRunMeta(models.Model):
+    """Hash of the sales history a product's forecast was last fitted on.
+
+    Lets generate_forecasts skip the Prophet fit for products whose
+    history is unchanged since the previous run.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='forecast_meta')
+    input_hash = models.CharField(max_length=128)
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
+
+    class Meta:
+        db_table = 'forecast_run_meta'
+
+    def __str__(self):
+        return f"Forecast meta for product {self.product_id}"
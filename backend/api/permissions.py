@@ -25,6 +25,20 @@ class IsShopStaff(permissions.BasePermission):
             return False
         return request.user.role in ['admin', 'manager', 'staff']
 
+class IsBatchAuthorized(permissions.BasePermission):
+    """
+    Allows access to staff/superusers and the 'admin', 'manager' and 'staff' roles.
+    Mirrors the manual role check previously duplicated in the batch viewsets.
+    """
+    def has_permission(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        return bool(
+            user.is_staff or user.is_superuser or
+            (user.role and user.role.lower() in ['admin', 'manager', 'staff'])
+        )
+
 class HasShopAccess(permissions.BasePermission):
     """
     Custom permission to check if a user has access to a specific shop.
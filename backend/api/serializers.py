@@ -1,5 +1,29 @@
+from functools import lru_cache
+
 from django.contrib.auth.hashers import make_password
 from rest_framework import serializers
+from rest_framework.utils import model_meta
+
+
+# ModelSerializer re-introspects the model (get_field_info) every time a
+# serializer is instantiated -- once per row for the nested Sale -> SaleItem
+# -> Product -> Category chain. The result depends only on the model class,
+# so memoize it; bound Field objects themselves can't be shared across
+# instances (they hold parent/context state), which is why the caching stops
+# at the introspection layer.
+_get_field_info = model_meta.get_field_info
+
+
+@lru_cache(maxsize=None)
+def _field_info_for_class(model_class):
+    return _get_field_info(model_class)
+
+
+def _cached_get_field_info(model):
+    return _field_info_for_class(model if isinstance(model, type) else type(model))
+
+
+model_meta.get_field_info = _cached_get_field_info
 from .models import (
     User, Category, Product, RestockRule,
     SaleItem, Sale, Activity, ProductForecast,
@@ -7,8 +31,9 @@ from .models import (
 )
 import datetime
 from django.utils import timezone
+from django.core.cache import cache
 from django.db.models import Max
-from django.db import connection
+from django.db import IntegrityError, connection
 from decimal import Decimal
 import logging
 from .utils import to_nairobi
@@ -19,6 +44,74 @@ import numpy as np
 logger = logging.getLogger(__name__)
 
 
+PRICE_STATS_TTL = 300  # seconds
+
+
+def _stats_from_prices(prices):
+    """IQR bounds for a list of prices; empty dict when data is too sparse."""
+    if len(prices) < 3:
+        return {}
+    q1 = np.percentile(prices, 25)
+    q3 = np.percentile(prices, 75)
+    iqr = q3 - q1
+    return {
+        'lower_bound': q1 - 1.5 * iqr,
+        'upper_bound': q3 + 1.5 * iqr,
+        'q1': q1,
+        'q3': q3,
+        'iqr': iqr
+    }
+
+
+def warm_category_price_stats(category_ids):
+    """
+    Populate the per-category price stats cache for all given categories with
+    a single grouped query, so subsequent is_price_outlier calls are cache
+    hits. Used by bulk imports to avoid one aggregation query per row.
+    """
+    missing = [
+        cid for cid in set(category_ids)
+        if cid is not None and cache.get(f"price_stats:{cid}") is None
+    ]
+    if not missing:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT category_id, array_agg(sell_price) FROM products
+            WHERE category_id = ANY(%s) AND sell_price > 0
+            GROUP BY category_id
+        """, [missing])
+        rows = cursor.fetchall()
+    seen = set()
+    for category_id, prices in rows:
+        seen.add(category_id)
+        stats = _stats_from_prices([float(p) for p in prices])
+        cache.set(f"price_stats:{category_id}", stats, PRICE_STATS_TTL)
+    for category_id in set(missing) - seen:
+        cache.set(f"price_stats:{category_id}", {}, PRICE_STATS_TTL)
+
+
+def _category_price_stats(category_id):
+    """
+    Compute IQR price stats over a category's products, cached for a short
+    TTL so bulk imports don't re-run the same aggregation per written row.
+    Returns None when there is not enough data.
+    """
+    key = f"price_stats:{category_id}"
+    stats = cache.get(key)
+    if stats is None:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT sell_price FROM products
+                WHERE category_id = %s AND sell_price > 0
+            """, [category_id])
+            prices = [float(row[0]) for row in cursor.fetchall()]
+
+        stats = _stats_from_prices(prices)
+        cache.set(key, stats, PRICE_STATS_TTL)
+    return stats or None
+
+
 # Utility function for price outlier detection
 def is_price_outlier(product_name, category_id, price):
     """
@@ -27,37 +120,13 @@ def is_price_outlier(product_name, category_id, price):
     Returns: (is_outlier: bool, stats: dict)
     """
     try:
-        # Get prices of products in the same category
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT sell_price FROM products 
-                WHERE category_id = %s AND sell_price > 0
-            """, [category_id])
-            prices = [float(row[0]) for row in cursor.fetchall()]
-        
-        if len(prices) < 3:
-            # Not enough data to determine outliers
+        stats = _category_price_stats(category_id)
+        if stats is None:
             return False, {'message': 'Insufficient data for outlier detection'}
-        
-        # Calculate IQR
-        q1 = np.percentile(prices, 25)
-        q3 = np.percentile(prices, 75)
-        iqr = q3 - q1
-        
-        # Calculate bounds
-        lower_bound = q1 - 1.5 * iqr
-        upper_bound = q3 + 1.5 * iqr
-        
-        # Check if price is an outlier
-        is_outlier = price < lower_bound or price > upper_bound
-        
-        return is_outlier, {
-            'lower_bound': lower_bound,
-            'upper_bound': upper_bound,
-            'q1': q1,
-            'q3': q3,
-            'iqr': iqr
-        }
+
+        # Check if price is an outlier (cheap compare; stats come from cache)
+        is_outlier = price < stats['lower_bound'] or price > stats['upper_bound']
+        return is_outlier, stats
     except Exception as e:
         logger.error(f"Error in price outlier detection: {str(e)}")
         return False, {'error': str(e)}
@@ -163,8 +232,8 @@ class CategorySerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Ensure name is properly formatted
         validated_data['name'] = validated_data['name'].strip()
-        # Set timestamp
-        validated_data['created_at'] = datetime.datetime.now()
+        # Set timestamp (aware; naive datetime.now() mixes badly with USE_TZ)
+        validated_data['created_at'] = timezone.now()
         return super().create(validated_data)
 
     def update(self, instance, validated_data):
@@ -197,6 +266,11 @@ class ProductSerializer(serializers.ModelSerializer):
         return obj.quantity_difference()
     
     def get_has_shop_inventory(self, obj):
+        # with_shop_totals annotates this for list queries; fall back to a
+        # per-instance EXISTS only when serializing outside that queryset
+        annotated = getattr(obj, '_has_shop_inventory', None)
+        if annotated is not None:
+            return annotated
         from .models import ShopInventory
         return ShopInventory.objects.filter(product=obj).exists()
     
@@ -233,59 +307,55 @@ class ProductSerializer(serializers.ModelSerializer):
                 if not valid:
                     raise serializers.ValidationError({'sku': error})
 
-            # Validate category
-            category_id = validated_data.get('category_id')
-            if category_id:
-                with connection.cursor() as cursor:
-                    cursor.execute("SELECT id FROM categories WHERE id = %s", [category_id])
-                    if not cursor.fetchone():
-                        raise serializers.ValidationError("Invalid category ID")
-
             # Format decimal fields
             for field in ['buy_price', 'sell_price']:
                 if field in validated_data:
                     validated_data[field] = Decimal(str(validated_data[field])).quantize(Decimal('0.01'))
 
-            # Set timestamps with timezone awareness
-            validated_data['created_at'] = timezone.now()
-            validated_data['updated_at'] = timezone.now()
-
-            # Create the product
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO products (
-                        sku, name, description, category_id, 
-                        min_stock_level, buy_price, sell_price, 
-                        carton_buy_price, carton_sell_price,
-                        barcode, bc_item_no, last_bc_sync,
-                        uom_type, pieces_per_carton, master_quantity,
-                        created_at, updated_at
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """, [
-                    validated_data.get('sku'),
-                    validated_data.get('name'),
-                    validated_data.get('description'),
-                    validated_data.get('category_id'),
-                    validated_data.get('min_stock_level', 0),
-                    validated_data.get('buy_price', 0),
-                    validated_data.get('sell_price', 0),
-                    validated_data.get('carton_buy_price'),
-                    validated_data.get('carton_sell_price'),
-                    validated_data.get('barcode'),
-                    validated_data.get('bc_item_no'),
-                    validated_data.get('last_bc_sync'),
-                    validated_data.get('uom_type', 'PCS'),
-                    validated_data.get('pieces_per_carton', 1),
-                    validated_data.get('master_quantity', 0),
-                    validated_data.get('created_at'),
-                    validated_data.get('updated_at')
-                ])
-                product_id = cursor.fetchone()[0]
-
-            # Return the created Product instance
-            return Product.objects.get(id=product_id)
-
+            # Set timestamps with timezone awareness; one clock read for both
+            now = timezone.now()
+            validated_data['created_at'] = now
+            validated_data['updated_at'] = now
+
+            # One round-trip: RETURNING * maps the inserted row straight
+            # back onto a Product, replacing the category existence SELECT
+            # (the FK constraint enforces it now) and the re-fetch by id
+            created = Product.objects.raw("""
+                INSERT INTO products (
+                    sku, name, description, category_id,
+                    min_stock_level, buy_price, sell_price,
+                    carton_buy_price, carton_sell_price,
+                    barcode, bc_item_no, last_bc_sync,
+                    uom_type, pieces_per_carton, master_quantity,
+                    created_at, updated_at
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING *
+            """, [
+                validated_data.get('sku'),
+                validated_data.get('name'),
+                validated_data.get('description'),
+                validated_data.get('category_id'),
+                validated_data.get('min_stock_level', 0),
+                validated_data.get('buy_price', 0),
+                validated_data.get('sell_price', 0),
+                validated_data.get('carton_buy_price'),
+                validated_data.get('carton_sell_price'),
+                validated_data.get('barcode'),
+                validated_data.get('bc_item_no'),
+                validated_data.get('last_bc_sync'),
+                validated_data.get('uom_type', 'PCS'),
+                validated_data.get('pieces_per_carton', 1),
+                validated_data.get('master_quantity', 0),
+                validated_data.get('created_at'),
+                validated_data.get('updated_at')
+            ])
+            return list(created)[0]
+
+        except IntegrityError as e:
+            logger.error(f"Error creating product: {str(e)}")
+            if 'category' in str(e):
+                raise serializers.ValidationError("Invalid category ID")
+            raise serializers.ValidationError(f"Error creating product: {str(e)}")
         except Exception as e:
             logger.error(f"Error creating product: {str(e)}")
             raise serializers.ValidationError(f"Error creating product: {str(e)}")
@@ -345,7 +415,7 @@ class SaleSerializer(serializers.ModelSerializer):
     items = SaleItemSerializer(many=True, read_only=True)
     shop_name = serializers.CharField(source='shop.name', read_only=True)
     customer_name = serializers.CharField(source='customer.name', read_only=True)
-    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=True)
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=True, read_only=True)
     discount = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=True, required=False)
     discount_percentage = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=True, required=False)
     original_amount = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=True, required=False)
@@ -125,17 +125,19 @@ class BCSyncService:
 
             # Send progress update via WebSocket
             if channel_layer:
+                # Encode once here; every subscribed consumer relays the same
+                # pre-serialized frame instead of re-running json.dumps
                 async_to_sync(channel_layer.group_send)(
                     "sync_progress",
                     {
                         "type": "sync_update",
-                        "data": {
+                        "text": json.dumps({
                             "current": index + 1,
                             "total": total_items,
                             "percentage": round((index + 1) / total_items * 100, 1),
                             "status": "syncing",
                             "last_product": item.get("displayName", "")
-                        }
+                        })
                     }
                 )
 
@@ -145,7 +147,7 @@ class BCSyncService:
                 "sync_progress",
                 {
                     "type": "sync_update",
-                    "data": {"status": "complete"}
+                    "text": json.dumps({"status": "complete"})
                 }
             )
 
@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .permissions import IsSystemAdmin, IsShopManager, IsShopStaff, HasShopAccess
+from django.core.cache import cache
 from django.db import transaction
 from django.db.models import Q, F, Sum
 from django.utils import timezone
@@ -347,7 +348,6 @@ class CustomerViewSet(viewsets.ModelViewSet):
                     shop=customer.shop,
                     transaction_type='payment',
                     amount=-amount,  # Negative for payment
-                    balance_after=customer.current_balance,
                     payment_method=payment_method,
                     notes=notes,
                     user=request.user
@@ -371,7 +371,14 @@ class PaymentMethodViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        # The table is tiny and read-mostly but every POS checkout loads
+        # it; cache the serialized payload and let the PaymentMethod
+        # post_save/post_delete receivers in models.py invalidate on edits
+        data = cache.get(PaymentMethod.ACTIVE_CACHE_KEY)
+        if data is None:
+            data = self.get_serializer(self.get_queryset(), many=True).data
+            cache.set(PaymentMethod.ACTIVE_CACHE_KEY, data, 3600)
+        return Response(data)
 
 
 class CreditTransactionViewSet(viewsets.ReadOnlyModelViewSet):
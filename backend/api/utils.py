@@ -1,11 +1,12 @@
 from django.utils import timezone
-import pytz
 import datetime
+from zoneinfo import ZoneInfo
+
+NAIROBI_TZ = ZoneInfo('Africa/Nairobi')
 
 def to_nairobi(dt):
     if not dt:
         return None
-    nairobi_tz = pytz.timezone('Africa/Nairobi')
     if timezone.is_naive(dt):
         dt = timezone.make_aware(dt, datetime.timezone.utc)
-    return dt.astimezone(nairobi_tz) 
\ No newline at end of file
+    return dt.astimezone(NAIROBI_TZ)
@@ -4,7 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, BasePermission, AllowAny
 from .permissions import IsSystemAdmin, IsShopManager, IsShopStaff, HasShopAccess
 from django.contrib.auth import login, logout, get_user_model, authenticate
-from django.db.models import Sum, F, Count, Q
+from django.db.models import Sum, F, Count, Prefetch, Q
 from django.db.models.functions import TruncDate
 from .models import Category, Product, Sale, SaleItem, Activity, RestockRule, ProductForecast, Customer, CreditTransaction
 from .serializers import (
@@ -263,7 +263,10 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+    # list_fields projects the serialized columns and joins the category
+    # row; with_shop_totals pre-annotates the shop_stock sum so the
+    # serializer's quantity fields don't aggregate once per product
+    queryset = Product.objects.list_fields().with_shop_totals()
     serializer_class = ProductSerializer
 
     def get_permissions(self):
@@ -744,16 +747,11 @@ class ProductViewSet(viewsets.ModelViewSet):
                             # If it's not numeric, we can't easily increment.
                             return Response({'next_sku': current_sku})
                     else:
-                        # Fallback to old logic if sku_sequence is not set
-                        cursor.execute("""
-                            SELECT sku FROM products 
-                            WHERE sku ~ '^[0-9]+$' 
-                            ORDER BY CAST(sku AS INTEGER) DESC 
-                            LIMIT 1
-                        """)
-                        result = cursor.fetchone()
-                        highest_sku = int(result[0]) if result else 139
-                        next_sku = str(highest_sku + 1)
+                        # Fallback when sku_sequence is not set: a dedicated
+                        # sequence (seeded from MAX(sku) in the migration)
+                        # hands out numbers race-free with no regex scan
+                        cursor.execute("SELECT nextval('product_sku_seq')")
+                        next_sku = str(cursor.fetchone()[0])
                         return Response({'next_sku': next_sku})
         except Exception as e:
             return Response({'detail': f'Error generating next SKU: {str(e)}'}, status=500)
@@ -903,7 +901,12 @@ class ProductViewSet(viewsets.ModelViewSet):
 
 
 class SaleViewSet(viewsets.ModelViewSet):
-    queryset = Sale.objects.all()
+    # SaleSerializer nests user/shop/customer plus items -> product ->
+    # category; joining and prefetching here keeps serialization at a
+    # fixed query count regardless of sale size
+    queryset = Sale.objects.select_related('user', 'shop', 'customer').prefetch_related(
+        Prefetch('items', queryset=SaleItem.objects.select_related('product__category'))
+    )
     serializer_class = SaleSerializer
 
     def get_permissions(self):
@@ -951,17 +954,12 @@ class SaleViewSet(viewsets.ModelViewSet):
                 columns = [col[0] for col in cursor.description]
                 sales = [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-                # Format the data
-                for sale in sales:
-                    # Format dates
-                    if 'sale_date' in sale and sale['sale_date']:
-                        sale['sale_date'] = sale['sale_date'].isoformat()
-                    if 'created_at' in sale and sale['created_at']:
-                        sale['created_at'] = sale['created_at'].isoformat()
-
-                    # Get sale items
+                # One query loads every sale's items instead of one per sale
+                items_by_sale = {}
+                if sales:
                     cursor.execute("""
-                        SELECT 
+                        SELECT
+                            si.sale_id,
                             si.id,
                             si.quantity,
                             si.unit_price,
@@ -969,11 +967,20 @@ class SaleViewSet(viewsets.ModelViewSet):
                             p.name as product_name
                         FROM sale_items si
                         JOIN products p ON si.product_id = p.id
-                        WHERE si.sale_id = %s
-                    """, [sale['id']])
-                    items_columns = [col[0] for col in cursor.description]
-                    items = [dict(zip(items_columns, row)) for row in cursor.fetchall()]
-                    sale['items'] = items
+                        WHERE si.sale_id = ANY(%s)
+                    """, [[sale['id'] for sale in sales]])
+                    items_columns = [col[0] for col in cursor.description[1:]]
+                    for row in cursor.fetchall():
+                        items_by_sale.setdefault(row[0], []).append(dict(zip(items_columns, row[1:])))
+
+                # Format the data
+                for sale in sales:
+                    # Format dates
+                    if 'sale_date' in sale and sale['sale_date']:
+                        sale['sale_date'] = sale['sale_date'].isoformat()
+                    if 'created_at' in sale and sale['created_at']:
+                        sale['created_at'] = sale['created_at'].isoformat()
+                    sale['items'] = items_by_sale.get(sale['id'], [])
 
                 return Response(sales)
         except Exception as e:
@@ -1020,7 +1027,6 @@ class SaleViewSet(viewsets.ModelViewSet):
                                 sale=sale,
                                 transaction_type='sale',
                                 amount=sale.amount_credit,
-                                balance_after=customer.current_balance,
                                 created_by=request.user
                             )
                         
@@ -1037,7 +1043,6 @@ class SaleViewSet(viewsets.ModelViewSet):
                                 sale=sale,
                                 transaction_type='payment',
                                 amount=-Decimal(str(repayment_amount)),
-                                balance_after=customer.current_balance,
                                 notes=f"Repayment during Sale #{sale.id}",
                                 created_by=request.user
                             )
@@ -1125,21 +1130,28 @@ class SaleViewSet(viewsets.ModelViewSet):
                             logger.warning(f'Unexpected remaining quantity after FIFO processing: {remaining_quantity}')
                             raise APIError('Error processing sale quantities')
 
-                    # Now, create sale items for each portion
-                    for portion in sale_portions:
-                        from .batch_models import BatchSaleItem
-                        sale_item = SaleItem.objects.create(
+                    # Now, create sale items for each portion; bulk_create
+                    # returns PKs on Postgres, so the batch links can ride a
+                    # second multi-row INSERT instead of 2 statements/portion
+                    from .batch_models import BatchSaleItem
+                    created_items = SaleItem.objects.bulk_create([
+                        SaleItem(
                             sale=sale,
                             product=product,
                             quantity=portion['quantity'],
                             unit_price=portion['sell_price'],
                             total_price=portion['quantity'] * portion['sell_price']
                         )
-                        BatchSaleItem.objects.create(
+                        for portion in sale_portions
+                    ], batch_size=500)
+                    BatchSaleItem.objects.bulk_create([
+                        BatchSaleItem(
                             sale_item=sale_item,
                             batch_id=portion['batch_id'],
                             quantity=portion['quantity']
                         )
+                        for sale_item, portion in zip(created_items, sale_portions)
+                    ], batch_size=500)
                     
                     # Recalculate master_quantity for this product
                     product.update_master_quantity()
@@ -61,7 +61,8 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 ASGI_APPLICATION = 'backend.asgi.application'
 
 PASSWORD_HASHERS = [
-    'django.contrib.auth.hashers.PBKDF2PasswordHasher',  # Default hasher
+    'django.contrib.auth.hashers.Argon2PasswordHasher',  # Preferred: cheaper verify at equal strength
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',  # Still matches existing hashes
     # ... other hashers
 ]
 